@@ -1,8 +1,11 @@
 import time
+import random
 import typing as t
 import logging
+import operator
 import sys
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from functools import cache
 from pathlib import Path
 
@@ -40,14 +43,19 @@ def bitcoind_version(ver: None | str = None) -> tuple[tuple[int, ...], None | st
     return vertuple, gitsha
 
 
+# Cached: version strings repeat heavily across hosts, and the local version can't
+# change during the life of the process. The no-argument (local) result is computed
+# on first call rather than at import, since the version file only exists on
+# bitcoind hosts.
+@cache
 def is_pre_taproot(ver: str | tuple[int, ...] | None = None) -> bool:
     """This this bitcoind node pre-taproot?"""
-    if isinstance(ver, str):
+    if ver is None:
+        ver_tuple = bitcoind_version()[0]
+    elif isinstance(ver, str):
         ver_tuple = bitcoind_version(ver)[0]
     elif isinstance(ver, tuple):
         ver_tuple = ver
-    elif ver is None:
-        ver_tuple = bitcoind_version()[0]
     else:
         raise ValueError("unexpected ver argument")
 
@@ -81,42 +89,75 @@ def get_rpc(host: None | str = None, boot_tries: int = 5, boot_delay_secs: int =
             log.info("hit excption waiting for bitcoin rpc to boot: %s",
                      e.__class__.__name__)
             log.debug("bitcoin RPC exception", exc_info=e)
-            time.sleep(boot_delay_secs)
-            boot_delay_secs *= 2
+            # Jitter so that a fleet of restarted hosts doesn't retry in lockstep.
+            time.sleep(boot_delay_secs + random.uniform(0, 0.5))
+            boot_delay_secs = min(boot_delay_secs * 2, 60)
 
     raise RuntimeError(f"couldn't boot RPC {url}")
 
 
-@cache
-def get_rpc_for_hosts(hosts: t.Tuple[infra.Host]) -> t.Dict[str, BitcoinRpc]:
+# Keyed by (name, bmon_ip) pairs, which are cheap to hash relative to Host objects.
+_RPC_FOR_HOSTS_CACHE: dict[tuple[tuple[str, str], ...], dict[str, BitcoinRpc]] = {}
+
+
+def get_rpc_for_hosts(hosts: t.Tuple[infra.Host, ...]) -> t.Dict[str, BitcoinRpc]:
     # TODO: assumes that all hosts use same ports, credentials
-    return {host.name: get_rpc(host.bmon_ip) for host in hosts}
+    key = tuple((host.name, str(host.bmon_ip)) for host in hosts)
+
+    if (rpcmap := _RPC_FOR_HOSTS_CACHE.get(key)) is None:
+        rpcmap = {name: get_rpc(ip) for name, ip in key}
+        _RPC_FOR_HOSTS_CACHE[key] = rpcmap
+
+    return rpcmap
 
 
 RPC_ERROR_RESULT = object()
 
+# Shared across gather_rpc() calls so that we aren't starting and stopping threads
+# for each fan-out. Calls are I/O bound, so this is sized well above the number of
+# hosts we expect to monitor; threads are only spawned as needed.
+_RPC_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="bmon-rpc")
+
 
-def gather_rpc(rpc_call_arg: str | t.Callable[[BitcoinRpc], t.Any]) -> t.Dict[str, t.Any]:
+def gather_rpc(
+    rpc_call_arg: str | list[str] | t.Callable[[BitcoinRpc], t.Any],
+    fixed_wait_secs: float | None = None,
+) -> t.Dict[str, t.Any]:
     """
     Gather RPC resuls from all bitcoin hosts.
 
     Args:
-        rpc_call_arg: either a string that represents the RPC call or a
-            function that takes the RPC object as its only argument.
+        rpc_call_arg: either a string that represents the RPC call, a list of
+            such strings (sent to each host as a single batch request, yielding a
+            list of results per host), or a function that takes the RPC object as
+            its only argument.
+
+    Kwargs:
+        fixed_wait_secs: if given, only wait this long for results; hosts that
+            haven't responded by then are given RPC_ERROR_RESULT.
     """
     rpcmap = get_rpc_for_hosts(infra.get_bitcoind_hosts())
-    promises = {}
+    promise_to_host = {}
     results: dict[str, t.Any] = {}
 
-    with ThreadPoolExecutor(max_workers=10) as e:
-        for hostname, rpc in rpcmap.items():
+    call: t.Callable[[BitcoinRpc], t.Any]
+    if isinstance(rpc_call_arg, str):
+        call = operator.methodcaller("call", rpc_call_arg)
+    elif isinstance(rpc_call_arg, list):
+        batch = [(meth, tuple(args)) for meth, *args in map(str.split, rpc_call_arg)]
+        call = operator.methodcaller("call_batch", batch)
+    else:
+        call = rpc_call_arg
 
-            if isinstance(rpc_call_arg, str):
-                promises[hostname] = e.submit(rpc.call, rpc_call_arg)
-            else:
-                promises[hostname] = e.submit(rpc_call_arg, rpc)
+    for hostname, rpc in rpcmap.items():
+        promise = _RPC_EXECUTOR.submit(call, rpc)
+        promise_to_host[promise] = hostname
 
-        for hostname, promise in promises.items():
+    try:
+        # Harvest results as they arrive so that one slow host doesn't hold up
+        # handling of the rest.
+        for promise in as_completed(promise_to_host, timeout=fixed_wait_secs):
+            hostname = promise_to_host[promise]
             try:
                 results[hostname] = promise.result()
             except Exception as e:
@@ -127,6 +168,17 @@ def gather_rpc(rpc_call_arg: str | t.Callable[[BitcoinRpc], t.Any]) -> t.Dict[st
                     e,
                 )
                 results[hostname] = RPC_ERROR_RESULT
+    except FuturesTimeoutError:
+        for promise, hostname in promise_to_host.items():
+            if hostname not in results:
+                promise.cancel()
+                log.warning(
+                    "host %r didn't respond to %s within %ss",
+                    hostname,
+                    rpc_call_arg,
+                    fixed_wait_secs,
+                )
+                results[hostname] = RPC_ERROR_RESULT
 
     return results
 
@@ -140,12 +192,16 @@ def wait_for_synced():
     """
     tries = 12
     backoff_secs = 2
+    # Poll quickly while the chain is advancing, but back off while it's stalled
+    # (e.g. waiting on peers) to avoid hammering bitcoind with RPCs.
+    poll_secs = 1.0
+    last_height = None
     is_synced = False
     got = {}
     i = 0
     rpc = get_rpc()
 
-    while not is_synced:
+    while tries and not is_synced:
         try:
             got = rpc.getblockchaininfo()
         except Exception as e:
@@ -156,7 +212,14 @@ def wait_for_synced():
                 backoff_secs *= 2
         else:
             is_synced = float(got["verificationprogress"]) > 0.9999
-            time.sleep(1)
+            if got["blocks"] == last_height:
+                poll_secs = min(poll_secs * 1.5, 30)
+            else:
+                poll_secs = 1.0
+            last_height = got["blocks"]
+
+            if not is_synced:
+                time.sleep(poll_secs + random.uniform(0, 0.5))
             tries = 12
 
             if i % 40 == 0:
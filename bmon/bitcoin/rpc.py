@@ -11,7 +11,10 @@
 # propagated, or distributed except according to the terms contained in the
 # LICENSE file.
 import time
+import select
 import socket
+import threading
+import itertools
 import http.client as httplib
 import json
 import base64
@@ -21,10 +24,15 @@ import logging
 from decimal import Decimal
 from typing import IO
 
+import orjson
+
 
 DEFAULT_USER_AGENT = "AuthServiceProxy/0.1"
 DEFAULT_HTTP_TIMEOUT = 30
 
+# The most idle keep-alive connections each BitcoinRpc holds on to.
+MAX_IDLE_CONNECTIONS = 16
+
 log = logging.getLogger("bitcoin-rpc")
 
 
@@ -104,12 +112,33 @@ class BitcoinRpc(object):
         if self._parsed_url.scheme not in ("http",):
             raise ValueError("Unsupported URL scheme %r" % self._parsed_url.scheme)
 
-        self.__id_count = 0
+        # next() on a count is atomic, so ids stay unique when calls come from
+        # multiple threads.
+        self.__id_count = itertools.count(1)
+        self._no_arg_templates: dict[str, bytes] = {}
+
+        # Persistent connections to this host that aren't currently in use. Any
+        # thread checks one out per call and returns it afterwards, so connections
+        # are reused (HTTP keep-alive) rather than reopened for every call.
+        self._idle_conns: list[httplib.HTTPConnection] = []
+        self._idle_conns_lock = threading.Lock()
 
         self.__auth_header = None
         if authpair:
             self.__auth_header = b"Basic " + base64.b64encode(authpair.encode("utf8"))
 
+        # These don't change between calls, so build them once.
+        self._path = self._parsed_url.path
+        self._headers = {
+            "Host": self._parsed_url.hostname,
+            "User-Agent": DEFAULT_USER_AGENT,
+            "Content-type": "application/json",
+            "Connection": "keep-alive",
+        }
+
+        if self.__auth_header is not None:
+            self._headers["Authorization"] = self.__auth_header
+
     @property
     def port(self) -> int:
         if self._parsed_url.port is None:
@@ -117,12 +146,54 @@ class BitcoinRpc(object):
         else:
             return self._parsed_url.port
 
-    def _getconn(self, timeout=None):
-        return httplib.HTTPConnection(
-            self._parsed_url.hostname,
-            port=self.port,
-            timeout=timeout,
-        )
+    def _getconn(self, timeout=None) -> tuple[httplib.HTTPConnection, bool]:
+        """
+        Return a connection, and whether it was reused from the idle pool (in which
+        case the server may have since closed it).
+        """
+        while True:
+            with self._idle_conns_lock:
+                conn = self._idle_conns.pop() if self._idle_conns else None
+
+            if conn is None or conn.sock is None:
+                break
+            # An idle socket only becomes readable when the server has hung up on
+            # it (e.g. after bitcoind's -rpcservertimeout), so don't use it.
+            # poll() rather than select(), which can't take fds past FD_SETSIZE.
+            poller = select.poll()
+            poller.register(conn.sock, select.POLLIN)
+            if not poller.poll(0):
+                break
+            conn.close()
+
+        if conn is None:
+            return (
+                httplib.HTTPConnection(
+                    self._parsed_url.hostname,
+                    port=self.port,
+                    timeout=timeout,
+                ),
+                False,
+            )
+
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _clear_idle_conns(self):
+        with self._idle_conns_lock:
+            conns, self._idle_conns = self._idle_conns, []
+        for conn in conns:
+            conn.close()
+
+    def _putconn(self, conn):
+        """Return a connection whose response has been fully read for reuse."""
+        with self._idle_conns_lock:
+            if len(self._idle_conns) < MAX_IDLE_CONNECTIONS:
+                self._idle_conns.append(conn)
+                return
+        conn.close()
 
     def call(self, rpc_str: str, **kwargs) -> dict:
         """Call a method with a string."""
@@ -130,38 +201,148 @@ class BitcoinRpc(object):
         return self._call(meth, *args, **kwargs)
 
     def _call(self, rpc_call_name, *args, **kwargs):
-        self.__id_count += 1
+        """
+        Kwargs:
+            timeout: seconds to wait on the server.
+            decimal: if True (the default), parse floats in the response as
+                Decimals, which is necessary for exact amounts. Otherwise parse
+                them as floats with the much faster orjson.
+        """
+        call_id = next(self.__id_count)
         kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("decimal", True)
 
-        postdata = json.dumps(
-            {
-                "version": "1.1",
-                "method": rpc_call_name,
-                "params": args,
-                "id": self.__id_count,
-            }
-        )
+        if args:
+            postdata = json.dumps(
+                {
+                    "version": "1.1",
+                    "method": rpc_call_name,
+                    "params": args,
+                    "id": call_id,
+                }
+            ).encode("ascii")
+        else:
+            # Most of our polling calls take no arguments; skip the JSON encoder
+            # for these and just splice the id into a per-method template.
+            if (template := self._no_arg_templates.get(rpc_call_name)) is None:
+                template = self._no_arg_templates[rpc_call_name] = (
+                    '{"version": "1.1", "method": %s, "params": [], "id": %%d}'
+                    % json.dumps(rpc_call_name)
+                ).encode("ascii")
+            postdata = template % call_id
 
         log.debug(f"[{self.public_url}] calling %s%s", rpc_call_name, args)
 
-        headers = {
-            "Host": self._parsed_url.hostname,
-            "User-Agent": DEFAULT_USER_AGENT,
-            "Content-type": "application/json",
-        }
+        return self._unpack_result(
+            self._post(postdata, kwargs["timeout"], kwargs["decimal"])
+        )
 
-        if self.__auth_header is not None:
-            headers["Authorization"] = self.__auth_header
+    def call_batch(
+        self,
+        calls: list[tuple[str, tuple]],
+        return_exceptions: bool = False,
+        **kwargs,
+    ) -> list:
+        """
+        Make a number of calls in a single JSON-RPC batch request, i.e. one round
+        trip to the server.
+
+        Args:
+            calls: a list of (method_name, args) pairs.
+
+        Kwargs:
+            return_exceptions: if True, a call that fails has its JSONRPCError put
+                in its place in the results rather than raised. Failures of the
+                request as a whole are still raised.
+            See `_call()` for the rest.
+
+        Returns:
+            The results, in the same order as `calls`. Unless `return_exceptions`
+            is set, if any call fails, its JSONRPCError is raised.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("decimal", True)
+        ids = []
+        payload = []
+
+        for rpc_call_name, args in calls:
+            call_id = next(self.__id_count)
+            ids.append(call_id)
+            payload.append(
+                {
+                    "version": "1.1",
+                    "method": rpc_call_name,
+                    "params": list(args),
+                    "id": call_id,
+                }
+            )
+
+        log.debug(f"[{self.public_url}] calling batch %s", calls)
 
-        path = self._parsed_url.path
+        response = self._post(
+            json.dumps(payload).encode("ascii"), kwargs["timeout"], kwargs["decimal"]
+        )
+        if not isinstance(response, list):
+            # bitcoind responds with a single error object if the batch as a
+            # whole couldn't be processed.
+            raise JSONRPCError(
+                {"code": -343, "message": "expected a batch response: %.200r" % (response,)}
+            )
+
+        id_to_response = {r.get("id"): r for r in response}
+        results = []
+
+        for call_id in ids:
+            try:
+                if call_id not in id_to_response:
+                    raise JSONRPCError(
+                        {"code": -343, "message": f"missing JSON-RPC result for id {call_id}"}
+                    )
+                results.append(self._unpack_result(id_to_response[call_id]))
+            except JSONRPCError as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+
+        return results
+
+    def _post(self, postdata: bytes, timeout, decimal: bool = True):
+        """
+        `postdata` is sent as-is; json.dumps() escapes non-ASCII by default, so
+        callers can encode it as ASCII up front and spare httplib doing it.
+        """
+        path = self._path
+        headers = self._headers
         tries = 5
         backoff = 0.3
         conn = None
         while tries:
+            conn, reused = self._getconn(timeout=timeout)
+            sent = False
             try:
-                conn = self._getconn(timeout=kwargs["timeout"])
                 conn.request("POST", path, postdata, headers)
+                sent = True
+                http_response = conn.getresponse()
+            except (httplib.RemoteDisconnected, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server hung up on a pooled connection before sending any
+                # response, which is how a connection closed by bitcoind's
+                # -rpcservertimeout looks if it got past the check in _getconn().
+                # The rest of the pool has probably gone stale too, so retry right
+                # away on a new connection.
+                log.debug("[%s] pooled connection went stale", self.public_url)
+                self._clear_idle_conns()
+                tries -= 1
+                if not tries:
+                    raise
             except (BlockingIOError, httplib.CannotSendRequest, socket.gaierror):
+                conn.close()
+                if sent:
+                    # The server may have received and executed the call, so don't
+                    # send it again.
+                    raise
                 log.exception(
                     f"hit request error: {path}, {postdata}, {self._parsed_url}"
                 )
@@ -170,11 +351,23 @@ class BitcoinRpc(object):
                     raise
                 time.sleep(backoff)
                 backoff *= 2
+            except Exception:
+                conn.close()
+                raise
             else:
                 break
 
         assert conn
-        response = self._get_response(conn)
+        try:
+            response = self._get_response(http_response, decimal)
+        except Exception:
+            conn.close()
+            raise
+
+        self._putconn(conn)
+        return response
+
+    def _unpack_result(self, response: dict):
         err = response.get("error")
         if err is not None:
             if isinstance(err, dict):
@@ -190,19 +383,24 @@ class BitcoinRpc(object):
         else:
             return response["result"]
 
-    def _get_response(self, conn):
-        http_response = conn.getresponse()
+    def _get_response(self, http_response, decimal: bool = True):
         if http_response is None:
             raise JSONRPCError(
                 {"code": -342, "message": "missing HTTP response from server"}
             )
 
-        rdata = http_response.read().decode("utf8")
+        rdata = http_response.read()
         try:
-            loaded = json.loads(rdata, parse_float=Decimal)
-            log.debug(f"[{self.public_url}] -> {loaded}")
+            if decimal:
+                loaded = json.loads(rdata, parse_float=Decimal)
+            else:
+                loaded = orjson.loads(rdata)
+            if log.isEnabledFor(logging.DEBUG):
+                # Avoid formatting potentially huge responses when we won't log them.
+                log.debug(f"[{self.public_url}] -> {loaded}")
             return loaded
         except Exception:
+            rdata = rdata.decode("utf8", errors="replace")
             raise JSONRPCError(
                 {
                     "code": -342,
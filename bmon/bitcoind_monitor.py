@@ -1,6 +1,7 @@
 import os
 import signal
 import sys
+import time
 from pathlib import Path
 from wsgiref.simple_server import make_server
 import logging
@@ -57,37 +58,50 @@ BITCOIND_LOG_SIZE = Gauge(
 assert settings.BITCOIND_LOG_PATH
 bitcoind_log = Path(settings.BITCOIND_LOG_PATH)
 
+# Don't re-query the database for every scrape if we're being scraped frequently.
+DB_REFRESH_MIN_SECS = 1.0
+_last_db_refresh: float | None = None
+
+
+def _set_file_size_mib(gauge: Gauge, path: Path) -> None:
+    try:
+        gauge.set(os.stat(path).st_size / (1024 ** 2))
+    except FileNotFoundError:
+        pass
+
 
 def refresh_metrics():
-    log_dt = (
-        models.LogProgress.objects.filter(hostname=settings.HOSTNAME)
-        .order_by("-id")
-        .values_list("timestamp", flat=True)
-        .first()
-    )
+    global _last_db_refresh
+    now = time.monotonic()
 
-    if log_dt:
-        LAST_BITCOIND_LOG_SEEN_AT.set(log_dt.timestamp())
+    if _last_db_refresh is None or now - _last_db_refresh >= DB_REFRESH_MIN_SECS:
+        _last_db_refresh = now
 
-    BITCOIND_EVENT_TASKS_QUEUE_DEPTH.set(len(bitcoind_tasks.events_q))
-    BITCOIND_MEMPOOL_TASKS_QUEUE_DEPTH.set(len(bitcoind_tasks.mempool_q))
+        log_dt = (
+            models.LogProgress.objects.filter(hostname=settings.HOSTNAME)
+            .order_by("-id")
+            .values_list("timestamp", flat=True)
+            .first()
+        )
+
+        if log_dt:
+            LAST_BITCOIND_LOG_SEEN_AT.set(log_dt.timestamp())
 
-    cb = (
-        models.ConnectBlockEvent.objects.filter(host__name=settings.HOSTNAME)
-        .order_by("-id")
-        .first()
-    )
+        cb_dt = (
+            models.ConnectBlockEvent.objects.filter(host__name=settings.HOSTNAME)
+            .order_by("-id")
+            .values_list("timestamp", flat=True)
+            .first()
+        )
 
-    if cb:
-        LAST_CONNECT_BLOCK_AT.set(cb.timestamp.timestamp())
+        if cb_dt:
+            LAST_CONNECT_BLOCK_AT.set(cb_dt.timestamp())
 
-    if bitcoind_tasks.CURRENT_MEMPOOL_FILE.exists():
-        MEMPOOL_ACTIVITY_CACHE_SIZE.set(
-            os.path.getsize(bitcoind_tasks.CURRENT_MEMPOOL_FILE) / (1024 ** 2))
+    BITCOIND_EVENT_TASKS_QUEUE_DEPTH.set(len(bitcoind_tasks.events_q))
+    BITCOIND_MEMPOOL_TASKS_QUEUE_DEPTH.set(len(bitcoind_tasks.mempool_q))
 
-    if bitcoind_log.exists():
-        BITCOIND_LOG_SIZE.set(
-            os.path.getsize(bitcoind_log) / (1024 ** 2))
+    _set_file_size_mib(MEMPOOL_ACTIVITY_CACHE_SIZE, bitcoind_tasks.CURRENT_MEMPOOL_FILE)
+    _set_file_size_mib(BITCOIND_LOG_SIZE, bitcoind_log)
 
 
 def sigterm_handler(*_):
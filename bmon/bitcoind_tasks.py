@@ -3,6 +3,7 @@ Tasks that are run on each bitcoind hosts. These tasks consume from a queue that
 based on the redis instance local to this host, but often push into the server's queue.
 """
 import os
+import contextlib
 import datetime
 import subprocess
 import time
@@ -10,13 +11,17 @@ import logging
 import json
 import multiprocessing
 import typing as t
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 import fastavro
+import fastavro.validation
+import orjson
+import redis
 import walrus
 import django
-import google.cloud.storage
 from django.conf import settings
-from django.forms.models import model_to_dict
+from django.db import transaction
 from huey import RedisHuey, crontab
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bmon.settings")
@@ -30,18 +35,24 @@ log = logging.getLogger(__name__)
 
 redisdb = walrus.Database.from_url(settings.REDIS_LOCAL_URL, decode_responses=True)
 
+# The queues share a connection pool, as in server_tasks.
+huey_pool = redis.ConnectionPool.from_url(settings.REDIS_LOCAL_URL)
+
 events_q = RedisHuey(
-    "bmon-bitcoind-events", url=settings.REDIS_LOCAL_URL, immediate=settings.TESTING,
+    "bmon-bitcoind-events", connection_pool=huey_pool, immediate=settings.TESTING,
     duration_warn=5,  # warn if task takes longer than 5 seconds
 )
 
 # The mempool queue is special-cased because it's so high volume, we don't want it
 # starving other queues.
 mempool_q = RedisHuey(
-    "bmon-mempool-events", url=settings.REDIS_LOCAL_URL, immediate=settings.TESTING,
+    "bmon-mempool-events", connection_pool=huey_pool, immediate=settings.TESTING,
     duration_warn=5,  # warn if task takes longer than 5 seconds
 )
 
+events_q.pre_execute()(server_tasks.close_old_db_connections)
+mempool_q.pre_execute()(server_tasks.close_old_db_connections)
+
 
 @events_q.task()
 def send_event(event: dict, linehash: str):
@@ -77,16 +88,17 @@ def get_bmon_peer_id(bitcoind_peer_id: int) -> int:
 
     Syncs the peer cache if necessary.
     """
-    if bitcoind_peer_id not in peer_id_map:
+    if (bmon_peer_id := peer_id_map.get(bitcoind_peer_id)) is None:
         result = sync_peer_data(bitcoind_peer_id)
         result(blocking=True)
+        bmon_peer_id = peer_id_map.get(bitcoind_peer_id)
 
-    if bitcoind_peer_id not in peer_id_map:
+    if bmon_peer_id is None:
         raise RuntimeError(
             "can't find bmon peer ID for bitcoind peer %d", bitcoind_peer_id
         )
 
-    return int(peer_id_map[bitcoind_peer_id])
+    return int(bmon_peer_id)
 
 
 @events_q.periodic_task(crontab(minute="*"))
@@ -111,39 +123,22 @@ def compute_peer_stats_blocking(peerinfo: list[dict] | None = None):
         log.warning("exiting early - no peerinfo")
         return
 
-    minping = 1000000.0
-    maxping = 0.0
-    pingsum = 0.0
-    bytesrecv = 0
-    bytessent = 0
-    recv_per_msg = {}
-    sent_per_msg = {}
-
-    for p in peerinfo:
-        # Pingtime is conditionally included in nodes <= v0.19.0
-        if 'pingtime' not in p:
-            continue
-        pingtime = float(p["pingtime"])
-        if pingtime < minping:
-            minping = pingtime
-        if pingtime > maxping:
-            maxping = pingtime
-        pingsum += pingtime
-
-        bytesrecv += p["bytesrecv"]
-        bytessent += p["bytessent"]
+    # Pingtime is conditionally included in nodes <= v0.19.0
+    pinged = [p for p in peerinfo if "pingtime" in p]
+    pingtimes = [float(p["pingtime"]) for p in pinged]
 
-        for msg, val in p["bytesrecv_per_msg"].items():
-            if msg not in recv_per_msg:
-                recv_per_msg[msg] = 0
-            recv_per_msg[msg] += val
+    minping = min(pingtimes, default=1000000.0)
+    maxping = max(pingtimes, default=0.0)
+    meanping = sum(pingtimes) / len(peerinfo)
 
-        for msg, val in p["bytessent_per_msg"].items():
-            if msg not in sent_per_msg:
-                sent_per_msg[msg] = 0
-            sent_per_msg[msg] += val
+    bytesrecv = sum(p["bytesrecv"] for p in pinged)
+    bytessent = sum(p["bytessent"] for p in pinged)
+    recv_per_msg: Counter[str] = Counter()
+    sent_per_msg: Counter[str] = Counter()
 
-    meanping = pingsum / len(peerinfo)
+    for p in pinged:
+        recv_per_msg.update(p["bytesrecv_per_msg"])
+        sent_per_msg.update(p["bytessent_per_msg"])
 
     return models.PeerStats.objects.create(
         host=get_latest_host(),
@@ -153,8 +148,8 @@ def compute_peer_stats_blocking(peerinfo: list[dict] | None = None):
         ping_mean=meanping,
         bytesrecv=bytesrecv,
         bytessent=bytessent,
-        bytesrecv_per_msg=recv_per_msg,
-        bytessent_per_msg=sent_per_msg,
+        bytesrecv_per_msg=dict(recv_per_msg),
+        bytessent_per_msg=dict(sent_per_msg),
     )
 
 
@@ -170,20 +165,26 @@ def sync_peer_data_blocking(peer_id: None | int = None) -> dict[int, int]:
     Returns:
         A map of newly cached bitcoind peer ids to bmon Peer ids.
     """
-    with redisdb.lock('peers'):
+    # Expire the lock so that a worker dying mid-sync can't wedge peer syncing.
+    with redisdb.lock('peers', ttl=(1_000 * 60)):
         log.info("syncing peer data (peer_id=%s)", peer_id)
         try:
-            peerinfo = get_rpc().getpeerinfo()
+            peerinfo = get_rpc().getpeerinfo(decimal=False)
         except Exception:
             log.exception("failed to get peerinfo")
             return {}
 
+        to_cache = {}
         for peer in peerinfo:
             if "addr" not in peer or "id" not in peer:
                 log.warning("malformed peer, skipping: %s", peer)
                 continue
 
-            peerinfo_cache[peer["id"]] = util.json_dumps(peer)
+            to_cache[peer["id"]] = orjson.dumps(peer)
+
+        # Write all peers in a single round trip.
+        if to_cache:
+            peerinfo_cache.update(to_cache)
 
         if peer_id is not None:
             peerinfo = [p for p in peerinfo if p["id"] == peer_id]
@@ -195,53 +196,146 @@ def commit_peers_db(peerinfo: list[dict]) -> dict[int, int]:
     """
     Sync getpeerinfo output with the database.
     """
-    new_ids = {}
-    for peer in peerinfo:
-        kwargs, defaults = models.Peer.peerinfo_data(peer)
-        try:
-            obj, created = models.Peer.objects.get_or_create(defaults=defaults, **kwargs)
-        except models.Peer.MultipleObjectsReturned:
-            qs = models.Peer.objects.filter(**kwargs).order_by('-id')
-            latest = qs.first()
-            assert latest
-            deleted = qs.exclude(id=latest.id).delete()
-            log.warning("deleted %s duplicate Peers", deleted)
+    new_ids: dict[int, int] = {}
+    if not peerinfo:
+        return new_ids
 
-            obj, created = models.Peer.objects.get_or_create(defaults=defaults, **kwargs)
+    host = models.Host.objects.filter(name=settings.HOSTNAME).order_by("-id").first()
 
-        if created:
-            log.info("synced peer %d (num=%d) to database: %s", obj.id, obj.num, kwargs)
-            peer_id_map[obj.num] = obj.id
-            new_ids[obj.num] = obj.id
+    # Most peers are already in the database; fetch them in one query so we only
+    # need to go through get_or_create() for new (or duplicated) ones.
+    existing: dict[int, list[models.Peer]] = {}
+    for obj in models.Peer.objects.filter(
+        host=host, num__in=[p["id"] for p in peerinfo]
+    ):
+        existing.setdefault(obj.num, []).append(obj)
+
+    # One transaction (and so one commit) for all of the new peers, rather than one
+    # per get_or_create().
+    with transaction.atomic():
+        for peer in peerinfo:
+            kwargs, defaults = models.Peer.peerinfo_data(peer, host)
+            matches = [
+                obj for obj in existing.get(kwargs["num"], [])
+                if all(getattr(obj, k) == v for k, v in kwargs.items() if k != "host")
+            ]
+            if len(matches) == 1:
+                continue
+
+            try:
+                obj, created = models.Peer.objects.get_or_create(defaults=defaults, **kwargs)
+            except models.Peer.MultipleObjectsReturned:
+                qs = models.Peer.objects.filter(**kwargs).order_by('-id')
+                latest = qs.first()
+                assert latest
+                deleted = qs.exclude(id=latest.id).delete()
+                log.warning("deleted %s duplicate Peers", deleted)
+
+                obj, created = models.Peer.objects.get_or_create(defaults=defaults, **kwargs)
+
+            if created:
+                log.info("synced peer %d (num=%d) to database: %s", obj.id, obj.num, kwargs)
+                new_ids[obj.num] = obj.id
+
+    if new_ids:
+        peer_id_map.update(new_ids)
 
     return new_ids
 
 
 # Coordinate mempool activity with a lock since we're writing out to a single file.
-mempool_activity_lock = redisdb.lock("mempool-activity", ttl=1_000)
+mempool_activity_lock = redisdb.lock("mempool-activity", ttl=(1_000 * 60))
 mempool_ship_lock = redisdb.lock("mempool-log-ship", ttl=(1_000 * 60 * 8))
 
 LAST_SHIPPED_KEY = "mempool.last_shipped"
 CURRENT_MEMPOOL_FILE = settings.MEMPOOL_ACTIVITY_CACHE_PATH / "current"
 
 
+# Mempool activity is buffered in this redis list and then written out to the avro
+# file in batches, rather than opening the file and writing an avro block per record.
+MEMPOOL_BUFFER_KEY = "mempool.buffer"
+MEMPOOL_FLUSH_AT_RECORDS = 1_000
+MEMPOOL_FLUSH_MAX_RECORDS = 5_000
+# Drain at most this many chunks per flush, so that a big backlog can't hold us up
+# past the expiry of `mempool_activity_lock`; the rest waits for the next flush.
+MEMPOOL_FLUSH_MAX_CHUNKS = 10
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
 @mempool_q.task()
 def mempool_activity(avro_data: dict, linehash: str):
     """
-    Persist some mempool activity in the local cache; ship them off to
+    Buffer some mempool activity for persisting to the local cache; see
+    `flush_mempool_activity_blocking()`.
+    """
+    if isinstance(ts := avro_data["timestamp"], datetime.datetime):
+        # Store as timestamp-micros so that the record survives JSON encoding.
+        avro_data = dict(avro_data)
+        avro_data["timestamp"] = (ts - _EPOCH) // datetime.timedelta(microseconds=1)
+
+    buffered = redisdb.rpush(MEMPOOL_BUFFER_KEY, util.json_dumps(avro_data))
+    logfile_pos.mark(linehash)
+
+    if buffered >= MEMPOOL_FLUSH_AT_RECORDS:
+        flush_mempool_activity_blocking()
+
+
+@mempool_q.periodic_task(crontab(minute="*"))
+def flush_mempool_activity():
+    flush_mempool_activity_blocking()
+
+
+def flush_mempool_activity_blocking():
+    """
+    Persist buffered mempool activity in the local cache; ship them off to
     some remote server periodically.
     """
     SHIP_LOGS_EVERY_MINUTES = 120
 
     with mempool_activity_lock:
-        logfile_pos.mark(linehash)
+        # Open the file and set up the avro writer (which, when appending, means
+        # reading back the file's header and schema) once per flush, however many
+        # chunks we drain.
+        with contextlib.ExitStack() as stack:
+            writer = None
+
+            for _ in range(MEMPOOL_FLUSH_MAX_CHUNKS):
+                raw_records = redisdb.lrange(
+                    MEMPOOL_BUFFER_KEY, 0, MEMPOOL_FLUSH_MAX_RECORDS - 1)
+
+                if not raw_records:
+                    break
+
+                if writer is None:
+                    mode = "a+b"
+                    if not CURRENT_MEMPOOL_FILE.exists():
+                        mode = "wb"
+
+                    out = stack.enter_context(open(CURRENT_MEMPOOL_FILE, mode))
+                    # Since records are written in large batches, blocks compress
+                    # well. The Avro spec requires every reader to support deflate
+                    # (as well as null), so this doesn't constrain what consumes the
+                    # shipped files. When appending, fastavro uses the codec in the
+                    # file's header, so a file started with the null codec keeps it
+                    # until it's shipped.
+                    writer = fastavro.write.Writer(
+                        out, models.mempool_activity_avro_schema, codec="deflate"
+                    )
 
-        mode = "a+b"
-        if not CURRENT_MEMPOOL_FILE.exists():
-            mode = "wb"
+                for record in _valid_mempool_records(raw_records):
+                    writer.write(record)
 
-        with open(CURRENT_MEMPOOL_FILE, mode) as out:
-            fastavro.writer(out, models.mempool_activity_avro_schema, [avro_data])
+                writer.flush()
+                out.flush()
+
+                # Only drop records from the buffer once they're in the file, so that
+                # a failed write leaves them to be retried. Producers only append, so
+                # under the lock these are still at the head of the list.
+                redisdb.ltrim(MEMPOOL_BUFFER_KEY, len(raw_records), -1)
+
+                if len(raw_records) < MEMPOOL_FLUSH_MAX_RECORDS:
+                    break
 
         last_shipped = redisdb.get(LAST_SHIPPED_KEY)
         now = time.time()
@@ -249,13 +343,40 @@ def mempool_activity(avro_data: dict, linehash: str):
         if not last_shipped:
             redisdb[LAST_SHIPPED_KEY] = time.time()
         elif (now - (SHIP_LOGS_EVERY_MINUTES * 60)) >= float(last_shipped):
-            queue_mempool_to_ship()
+            if CURRENT_MEMPOOL_FILE.exists():
+                queue_mempool_to_ship()
+
+
+def _valid_mempool_records(raw_records: list[str]) -> list[dict]:
+    """
+    Decode buffered mempool records, dropping any that can't be written to the avro
+    file. A bad record would otherwise fail every flush and stay at the head of the
+    buffer, blocking everything behind it.
+    """
+    schema = models.mempool_activity_avro_schema
+    records = []
+
+    for raw in raw_records:
+        try:
+            record = util.json_loads(raw)
+        except ValueError:
+            record = None
+
+        if record is None or not fastavro.validation.validate(
+            record, schema, raise_errors=False
+        ):
+            log.error("dropping invalid mempool activity record: %.200r", raw)
+            continue
+
+        records.append(record)
+
+    return records
 
 
 def queue_mempool_to_ship():
     now_str = datetime.datetime.now().isoformat()
     shipfile = settings.MEMPOOL_ACTIVITY_CACHE_PATH / f"to-ship.{now_str}.avro"
-    subprocess.check_call(f"mv {CURRENT_MEMPOOL_FILE} {shipfile}", shell=True)
+    os.rename(CURRENT_MEMPOOL_FILE, shipfile)
     log.info(
         "moved mempool activity file %s to %s for shipment",
         CURRENT_MEMPOOL_FILE,
@@ -274,6 +395,9 @@ def construct_gcp_path_from_datetime_str(dt):
 @mempool_q.task()
 def ship_mempool_activity():
     """Send mempool activity file to a remote server."""
+    # Imported here since it's slow to import and only needed every couple of hours.
+    import google.cloud.storage
+
     if mempool_ship_lock.acquire(block=False):
         try:
             client = google.cloud.storage.Client.from_service_account_json(
@@ -281,15 +405,21 @@ def ship_mempool_activity():
             )
             bucket = client.get_bucket(settings.CHAINCODE_GCP_BUCKET)
 
-            for shipfile in settings.MEMPOOL_ACTIVITY_CACHE_PATH.glob("to-ship*"):
+            def ship(shipfile):
                 timestr = shipfile.name.split(".")[1]
                 target = construct_gcp_path_from_datetime_str(timestr)
                 d = bucket.blob(target)
                 d.upload_from_filename(shipfile)
 
                 moved = settings.MEMPOOL_ACTIVITY_CACHE_PATH / f"shipped.{timestr}.avro"
-                subprocess.check_call(f"mv {shipfile} {moved}", shell=True)
+                os.rename(shipfile, moved)
                 log.info("pushed mempool activity %s to Chaincode GCP", shipfile)
+
+            # Uploads are mostly waiting on the network, so drain any backlog of
+            # files concurrently.
+            shipfiles = list(settings.MEMPOOL_ACTIVITY_CACHE_PATH.glob("to-ship*"))
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(ship, shipfiles))
         except Exception:
             mempool_ship_lock.release()
             raise
@@ -319,18 +449,35 @@ def watch_bitcoind_logs():
         process_line(line, host)
 
 
+# Host records only change when bitcoind is reconfigured, so don't query for the
+# latest one on every call.
+LATEST_HOST_CACHE_SECS = 5 * 60
+_latest_host: tuple[models.Host, float] | None = None
+
+
 def get_latest_host() -> models.Host:
+    global _latest_host
+    if _latest_host and time.monotonic() - _latest_host[1] < LATEST_HOST_CACHE_SECS:
+        return _latest_host[0]
+
     h = models.Host.objects.filter(name=settings.HOSTNAME).order_by("-id").first()
     assert h
+    _latest_host = (h, time.monotonic())
     return h
 
 
 def create_host_record():
     def get_lshw(classn: str) -> dict:
         return json.loads(
-            subprocess.check_output(f"lshw -json -class {classn}", shell=True)
+            subprocess.check_output(["lshw", "-json", "-class", classn])
         )[0]
 
+    # lshw is slow, so query both hardware classes at once.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        processor_fut = executor.submit(get_lshw, "processor")
+        memory_fut = executor.submit(get_lshw, "memory")
+        processor, memory = processor_fut.result(), memory_fut.result()
+
     bitcoin_version = bitcoin.api.read_raw_bitcoind_version()
 
     # TODO hack
@@ -340,8 +487,8 @@ def create_host_record():
 
     host, created = models.Host.objects.get_or_create(
         name=settings.HOSTNAME,
-        cpu_info=get_lshw("processor")["product"],
-        memory_bytes=get_lshw("memory")["size"],
+        cpu_info=processor["product"],
+        memory_bytes=memory["size"],
         nproc=multiprocessing.cpu_count(),
         bitcoin_version=bitcoin_version,
         bitcoin_gitref=settings.BITCOIN_GITREF,
@@ -362,6 +509,9 @@ def create_host_record():
     else:
         log.info(f"Booting with existing host record: {host}")
 
+    global _latest_host
+    _latest_host = None
+
     return host
 
 
@@ -384,6 +534,41 @@ LOG_LISTENERS: ListenerList = (
     logparse.PongListener(ignore_older_than=datetime.timedelta(minutes=10)),
 )
 
+# Most lines are of no interest to any listener; checking for these up front is much
+# cheaper than running each listener on them.
+LOG_LISTENER_KEYWORDS: tuple[str, ...] = tuple(
+    dict.fromkeys(kw for listener in LOG_LISTENERS for kw in listener.keywords)
+)
+
+
+def _notify_reorg(got: models.ReorgEvent, host: models.Host) -> None:
+    log.error("saw reorg! %s", got)
+    util.pushover_notification(
+        f"[{host.name}] reorg: height={got.min_height} "
+        f"depth={len(got.old_blockhashes)}")
+
+
+def _notify_block_download_timeout(
+    got: models.BlockDownloadTimeout, host: models.Host
+) -> None:
+    util.pushover_notification(
+        f"[{host.name}] saw block download timeout for {got.blockhash}")
+
+
+def _notify_header_to_tip(got: models.HeaderToTipEvent, host: models.Host) -> None:
+    if got.header_to_tip_secs > 10:
+        util.pushover_notification(
+            f"[{host.name}] slow header-to-tip "
+            f"({got.header_to_tip_secs}) for {got.blockhash}")
+
+
+# Alerting for particular event types, keyed by model class.
+EVENT_NOTIFIERS: dict[type, t.Callable[[t.Any, models.Host], None]] = {
+    models.ReorgEvent: _notify_reorg,
+    models.BlockDownloadTimeout: _notify_block_download_timeout,
+    models.HeaderToTipEvent: _notify_header_to_tip,
+}
+
 
 def process_line(
     line: str,
@@ -394,7 +579,15 @@ def process_line(
     """
     Process a single bitcoind log line, prompting async tasks when necessary.
     """
-    linehash = logparse.linehash(line)
+    if listeners is None:
+        for keyword in LOG_LISTENER_KEYWORDS:
+            if keyword in line:
+                break
+        else:
+            return None
+
+    # Only computed once some listener has produced something from this line.
+    linehash: str | None = None
     ls: ListenerList = listeners or LOG_LISTENERS
     assert host
 
@@ -414,6 +607,9 @@ def process_line(
         if got is None:
             continue
 
+        if linehash is None:
+            linehash = logparse.linehash(line)
+
         # TODO make this less special casey
         if isinstance(got, models.MempoolAccept):
             got.host = host.name
@@ -436,7 +632,7 @@ def process_line(
         if not is_high_volume:
             log.info("Got an instance %r from line (%s) %r", got, linehash, line)
 
-        if hasattr(got, 'peer_id') and not is_high_volume:
+        if not is_high_volume and hasattr(got, 'peer_id'):
             # Need to fill out the `peer` foreign key
             peer_id = peer_id_map.get(got.peer_num)
             if not peer_id:
@@ -456,30 +652,17 @@ def process_line(
 
             got.peer_id = int(peer_id)  # type: ignore
 
-        if isinstance(got, models.ReorgEvent):
-            log.error("saw reorg! %s", got)
-            util.pushover_notification(
-                f"[{host.name}] reorg: height={got.min_height} "
-                f"depth={len(got.old_blockhashes)}")
-
-        elif isinstance(got, models.BlockDownloadTimeout):
-            util.pushover_notification(
-                f"[{host.name}] saw block download timeout for {got.blockhash}")
-
-        elif isinstance(got, models.HeaderToTipEvent):
-            if got.header_to_tip_secs > 10:
-                util.pushover_notification(
-                    f"[{host.name}] slow header-to-tip "
-                    f"({got.header_to_tip_secs}) for {got.blockhash}")
+        if notify := EVENT_NOTIFIERS.get(type(got)):
+            notify(got, host)
 
         try:
-            got.full_clean()
+            got.clean_event()
         except Exception:
             log.exception("model %s failed to validate!", got)
             # TODO: stash the bad model somewhere for later processing.
             continue
 
-        d = model_to_dict(got)
+        d = got.to_event_dict()
         d["_model"] = got.__class__.__name__
 
         send_event(d, linehash)
@@ -494,6 +677,8 @@ def process_line(
             # in the central server, which would make actually maintaining
             # that redis state slow for bitcoind servers on slow network links.
             #
+            # Marking here rather than in `send_event()` keeps the position moving
+            # forward in log order; events_q has more than one worker.
+            #
             # TODO somehow make this truly synchronous with the server.
-            logfile_pos.mark(linehash)
-            write_logfile_pos()
+            logfile_pos.mark(linehash, flush=True)
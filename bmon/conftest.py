@@ -1,6 +1,8 @@
 import os
+import copy
 import json
 import multiprocessing
+import functools
 from pathlib import Path
 import typing as t
 
@@ -11,14 +13,24 @@ from django.conf import settings
 from bmon import bitcoin, models
 
 
-def read_data_file(dirname) -> t.List[str]:
-    dir_path = Path(os.path.dirname(os.path.realpath(__file__)))
-    return (dir_path / "testdata" / dirname).read_text().splitlines()
+TESTDATA_PATH = Path(os.path.dirname(os.path.realpath(__file__))) / "testdata"
+_NPROC = multiprocessing.cpu_count()
+
+
+@functools.cache
+def read_data_file(dirname) -> t.Tuple[str, ...]:
+    # Cached across tests, so return an immutable sequence.
+    return tuple((TESTDATA_PATH / dirname).read_text().splitlines())
+
+
+@functools.cache
+def _read_json_data(filename):
+    return json.loads((TESTDATA_PATH / filename).read_text())
 
 
 def read_json_data(filename):
-    dir_path = Path(os.path.dirname(os.path.realpath(__file__)))
-    return json.loads((dir_path / "testdata" / filename).read_text())
+    # Parsed once, but copied so that tests can't alter each other's data.
+    return copy.deepcopy(_read_json_data(filename))
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -26,10 +38,24 @@ def raw_bitcoind_version():
     bitcoin.api.read_raw_bitcoind_version = lambda: "v23.99.0-447f50e4aed9"
 
 
+@functools.cache
+def _redis_clients() -> t.List[redis.Redis]:
+    # Reuse connections across tests. FLUSHALL clears every db on a server, so keep one
+    # client per server rather than per URL (the test URLs differ only by db).
+    clients: dict[tuple, redis.Redis] = {}
+    for url in (settings.REDIS_SERVER_URL, settings.REDIS_LOCAL_URL):
+        client = redis.Redis.from_url(url)
+        kwargs = client.connection_pool.connection_kwargs
+        server = (kwargs.get("host"), kwargs.get("port"), kwargs.get("path"))
+        clients.setdefault(server, client)
+    return list(clients.values())
+
+
 @pytest.fixture(autouse=True)
 def clear_redis():
-    for url in (settings.REDIS_SERVER_URL, settings.REDIS_LOCAL_URL):
-        redis.Redis.from_url(url).flushall()
+    for client in _redis_clients():
+        # Keys are removed immediately; only freeing their memory is deferred.
+        client.flushall(asynchronous=True)
 
 
 def make_host(name: str, bitcoin_version: str = "v23.0"):
@@ -40,7 +66,7 @@ def make_host(name: str, bitcoin_version: str = "v23.0"):
         name=name,
         cpu_info="test",
         memory_bytes=1024,
-        nproc=multiprocessing.cpu_count(),
+        nproc=_NPROC,
         bitcoin_version=bitcoin_version,
         bitcoin_gitref="",
         bitcoin_gitsha="",
@@ -60,6 +86,8 @@ def fake_hosts():
     """
     These hosts should match up with the file in ./infra/hosts_dev.yml
     """
+    # Created within each test's transaction, so they're rolled back along with
+    # everything else the test does and can't leak into tests that don't ask for them.
     host1 = make_host('bitcoind', 'v0.18.0')
     host2 = make_host('bitcoind-02')
     return host1, host2
@@ -1,26 +1,21 @@
 from django.conf import settings
 
 import bmon_infra as infra
-from . import models, mempool, bitcoin
+from . import models, mempool
 
 
 def get_bitcoind_hosts_to_policy_cohort() -> dict[models.Host, mempool.PolicyCohort]:
     hosts = infra.get_bitcoind_hosts()
-    # TODO this is an O(n) query
-    host_objs = list(
-        filter(
-            None,
-            [
-                models.Host.objects.filter(name=h.name).order_by("-id").first()
-                for h in hosts
-            ],
-        )
-    )
+
+    # Fetch every candidate row in one query and keep the latest per name. (Not
+    # using `.distinct("name")` since that's Postgres-only and tests run on sqlite.)
+    latest_by_name: dict[str, models.Host] = {}
+    for host in models.Host.objects.filter(
+        name__in=[h.name for h in hosts]
+    ).order_by("name", "-id"):
+        latest_by_name.setdefault(host.name, host)
+
+    host_objs = [latest_by_name[h.name] for h in hosts if h.name in latest_by_name]
     if not settings.TESTING:
         assert len(host_objs) == len(hosts)
-    return {
-        h: mempool.PolicyCohort.segwit
-        if bitcoin.is_pre_taproot(h.bitcoin_version)
-        else mempool.PolicyCohort.taproot
-        for h in host_objs
-    }
+    return {h: mempool.PolicyCohort.for_host(h) for h in host_objs}
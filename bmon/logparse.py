@@ -5,6 +5,9 @@ import re
 import hashlib
 import datetime
 import os
+import select
+import ctypes
+import ctypes.util
 import typing as t
 from pathlib import Path
 
@@ -42,30 +45,13 @@ def read_logfile_forever(
 
     if seek_to_cursor:
         log.info("attempting to seek to logline cursor %s", seek_to_cursor)
-        lineno = 0
+        start_pos = _find_cursor_pos(filename, seek_to_cursor)
 
-        while True:
-            line = current.readline()
-            if not line:
-                break
-
-            # Must strip the newline off the end to match contents as yielded below.
-            hashed = linehash(line.rstrip("\n"))
-
-            if hashed == seek_to_cursor:
-                start_pos = current.tell()
-                log.info(
-                    "found start of logs (per cursor %s) at %s",
-                    seek_to_cursor,
-                    start_pos,
-                )
-                break
-
-            lineno += 1
-            if lineno % 10_000 == 0:
-                log.info("still seeking... %s lines seen", lineno)
-
-        if not start_pos:
+        if start_pos:
+            log.info(
+                "found start of logs (per cursor %s) at %s", seek_to_cursor, start_pos
+            )
+        else:
             log.warning(
                 "desired logline cursor (%s) not found in file %s - parsing all lines",
                 seek_to_cursor,
@@ -80,20 +66,39 @@ def read_logfile_forever(
     curr_line = ""
     lines_processed = 0
     LOG_AFTER = 10_000
+    # Read in big chunks so that busy periods (e.g. IBD) cost a handful of reads and
+    # splits per many lines rather than a trip around this loop every few lines.
+    READ_CHUNK_CHARS = 64 * 1024
     got_line_yet = False
 
+    # If we can, wait to be notified that the file has been written to rather than
+    # polling it. The timeout bounds how long it takes to notice log rotation.
+    watcher = FileModifyWatcher.create()
+    if watcher:
+        watcher.watch(filename)
+    WATCH_TIMEOUT_SECS = 1.0
+
+    # Otherwise, when the log is quiet, back off how often we check it for new
+    # contents; reset to polling quickly as soon as there's activity.
+    IDLE_SLEEP_MIN_SECS = 0.01
+    IDLE_SLEEP_MAX_SECS = 0.25
+    idle_sleep_secs = IDLE_SLEEP_MIN_SECS
+
     while True:
         while True:
             # I'm doing this awkward "manual scan" for newlines because I found
             # file.readline() to be flakey; there were occasional misreads that
             # would smash lines together. This manual scan method seems to work
             # and is performant enough for my needs.
-            got: str = current.read(1024)
+            got: str = current.read(READ_CHUNK_CHARS)
 
             if not got:
                 # Out of contents
                 break
-            elif "\n" in got:
+
+            idle_sleep_secs = IDLE_SLEEP_MIN_SECS
+
+            if "\n" in got:
                 lines = got.split("\n")
                 assert len(lines) >= 2
 
@@ -129,46 +134,125 @@ def read_logfile_forever(
                 current.close()
                 current = new
                 curino = os.fstat(current.fileno()).st_ino
+                if watcher:
+                    watcher.watch(filename)
+            elif watcher and watcher.wd is not None:
+                watcher.wait(WATCH_TIMEOUT_SECS)
             else:
-                time.sleep(0.01)
+                time.sleep(idle_sleep_secs)
+                idle_sleep_secs = min(idle_sleep_secs * 2, IDLE_SLEEP_MAX_SECS)
         except IOError:
             pass
 
 
+class FileModifyWatcher:
+    """
+    Wait for a file to be written to using inotify, called through ctypes so that we
+    don't need a dependency for it. Linux only; see `create()`.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, libc: ctypes.CDLL, fd: int):
+        self.libc = libc
+        self.fd = fd
+        self.wd: int | None = None
+
+    @classmethod
+    def create(cls) -> t.Optional["FileModifyWatcher"]:
+        """Return a watcher, or None if inotify isn't available."""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(cls.IN_NONBLOCK | cls.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+
+        if fd < 0:
+            log.warning("inotify_init1 failed (errno %s)", ctypes.get_errno())
+            return None
+
+        return cls(libc, fd)
+
+    def watch(self, filename: str | Path) -> None:
+        """Watch `filename`, replacing any file watched previously."""
+        if self.wd is not None:
+            # Fails harmlessly if the watch went away with a deleted file.
+            self.libc.inotify_rm_watch(self.fd, self.wd)
+            self.wd = None
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(filename), self.IN_MODIFY)
+        if wd < 0:
+            log.warning(
+                "couldn't watch %s (errno %s); polling instead",
+                filename,
+                ctypes.get_errno(),
+            )
+        else:
+            self.wd = wd
+
+    def wait(self, timeout: float) -> None:
+        """Block until the watched file is written to, or for `timeout` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            # Drain the queued events; we only care that there were some.
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+
 class LogfilePosManager:
     """
     Manage persisting a cursor into the bitcoind's logfile.
 
     The cursor is cached in the bitcoind-local redis to not hinder performance, and then
     periodically flushed into postgres.
+
+    The position is stored as a single redis string, so reads and writes of it are
+    atomic without any additional locking.
     """
 
     REDIS_SEPARATOR = " | "
 
+    # Don't write through to postgres on `mark(flush=True)` more often than this; the
+    # periodic `flush()` picks up anything in between.
+    DB_FLUSH_MIN_SECS = 5.0
+
     def __init__(self, host: str, db: walrus.Database):
         self.host = host
         self.redis_key = f"logpos.{host}"
         self.db = db
-        self.lock = self.db.lock(f"lock.logpos.{host}", ttl=1_000)
+        self._last_db_write: float | None = None
 
     def getpos(self) -> None | tuple[str, datetime.datetime]:
-        with self.lock:
-            if not (got := self.db.get(self.redis_key)):
-                return None
-            linehash, dt_str = got.split(self.REDIS_SEPARATOR)
-            return (linehash, datetime.datetime.fromisoformat(dt_str))
+        if not (got := self.db.get(self.redis_key)):
+            return None
+        linehash, dt_str = got.split(self.REDIS_SEPARATOR)
+        return (linehash, datetime.datetime.fromisoformat(dt_str))
 
-    def mark(self, linehash: str) -> None:
+    def mark(self, linehash: str, flush: bool = False) -> None:
         """
         Persist logfile position in redis.
 
         We cache in redis because some high-volume events would overwhelm the db with
         writes to maintain this state (e.g. MempoolAccept).
+
+        Kwargs:
+            flush: if True, also write the position to postgres without having to
+                read it back out of redis - unless we've done so within the last
+                `DB_FLUSH_MIN_SECS`.
         """
-        with self.lock:
-            self.db[
-                self.redis_key
-            ] = f"{linehash}{self.REDIS_SEPARATOR}{timezone.now().isoformat()}"
+        now = timezone.now()
+        self.db[self.redis_key] = f"{linehash}{self.REDIS_SEPARATOR}{now.isoformat()}"
+
+        if flush and (
+            self._last_db_write is None
+            or time.monotonic() - self._last_db_write >= self.DB_FLUSH_MIN_SECS
+        ):
+            self._write_db(linehash, now)
 
     def flush(self) -> None:
         """
@@ -176,13 +260,73 @@ class LogfilePosManager:
         """
         if not (got := self.getpos()):
             return
-        linehash, dt = got
+        self._write_db(*got)
 
+    def _write_db(self, linehash: str, dt: datetime.datetime) -> None:
         log.info("flushing logfile pos for %s (%s @ %s)", self.host, linehash, dt)
         models.LogProgress.objects.update_or_create(
             hostname=self.host,
             defaults={"loghash": linehash, "timestamp": dt},
         )
+        self._last_db_write = time.monotonic()
+
+
+def _find_cursor_pos(
+    filename: str | Path, cursor: str, chunk_size: int = 1 << 20
+) -> int | None:
+    """
+    Return the byte offset just after the line that hashes to `cursor`, if any.
+
+    debug.log can be very large and the cursor is usually near its end, so this reads
+    the file backwards from the end in big binary chunks, hashing each chunk's lines in
+    one go, and stops as soon as it finds the cursor.
+    """
+    lines_seen = 0
+
+    with open(filename, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        # The start of a line that runs on from before `pos`; we don't have all of it
+        # until we've read the chunk before it.
+        carry = b""
+        carry_has_newline = False
+
+        while pos > 0:
+            start = max(0, pos - chunk_size)
+            f.seek(start)
+            buf = f.read(pos - start) + carry
+            pieces = buf.split(b"\n")
+            last_has_newline = carry_has_newline
+
+            # Byte offset of each line's end, including its newline if it has one. Every
+            # piece but the last is followed by a newline.
+            ends = []
+            offset = start
+            for piece in pieces[:-1]:
+                offset += len(piece) + 1
+                ends.append(offset)
+            ends.append(offset + len(pieces[-1]) + int(last_has_newline))
+
+            if start > 0:
+                # The first piece may be the tail end of a line from an earlier chunk.
+                carry = pieces.pop(0)
+                carry_has_newline = bool(pieces) or last_has_newline
+                ends.pop(0)
+            if pieces and not pieces[-1] and not last_has_newline:
+                # Nothing follows the file's final newline.
+                pieces.pop()
+                ends.pop()
+
+            pieces.reverse()
+            ends.reverse()
+            for end, hashed in zip(ends, linehash_batch(pieces)):
+                if hashed == cursor:
+                    return end
+
+            pos = start
+            lines_seen += len(pieces)
+            log.info("still seeking... %s lines seen", lines_seen)
+
+    return None
 
 
 def linehash(w: str) -> str:
@@ -192,6 +336,25 @@ def linehash(w: str) -> str:
     return hashlib.md5(w.encode()).hexdigest()
 
 
+def linehash_batch(lines: list[bytes]) -> list[str]:
+    """
+    Equivalent to `linehash()` for each of a batch of raw lines (without their
+    "\n"), as read by `read_logfile_forever()`: text mode turns "\r\n" into "\n"
+    and `errors="ignore"` drops any bytes that aren't valid UTF-8.
+    """
+    md5 = hashlib.md5
+    hashes = []
+
+    for line in lines:
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if not line.isascii():
+            line = line.decode(errors="ignore").encode()
+        hashes.append(md5(line).hexdigest())
+
+    return hashes
+
+
 LineHash = str
 
 
@@ -202,7 +365,8 @@ def get_time(line: str = "", timestr: str = "") -> datetime.datetime:
     if not (line or timestr):
         raise ValueError("arg required")
     if not timestr:
-        timestr = line.split()[0]
+        # Only the leading timestamp is needed; don't split the rest of the line.
+        timestr = line.split(None, 1)[0]
 
     d = datetime.datetime.fromisoformat(timestr.strip())
 
@@ -226,10 +390,14 @@ def str_or_none(s: t.Any) -> None | str:
 
 
 class Listener(t.Protocol):
+    # Substrings, one of which appears in every line that this listener acts on. Lines
+    # that contain none of these may be skipped without calling `process_line()`.
+    keywords: tuple[str, ...]
+
     def process_line(self, line: str) -> t.Any:
         pass
 
-    def _match(self, patterns: t.Set[re.Pattern], line: str) -> dict:
+    def _match(self, patterns: t.Iterable[re.Pattern], line: str) -> dict:
         matches = {}
 
         for patt in patterns:
@@ -241,11 +409,13 @@ class Listener(t.Protocol):
 
 class MempoolAcceptListener(Listener):
 
-    _accept_sub_patts = {
+    keywords = (" AcceptToMemoryPool:",)
+
+    _accept_sub_patts = (
         _PEER_PATT,
         re.compile(rf"\s+accepted (?P<txhash>{_HASH})"),
         re.compile(r"poolsz (?P<pool_size_txns>\d+) txn, (?P<pool_size_kb>\d+) kB"),
-    }
+    )
 
     def __init__(self, ignore_older_than: t.Optional[datetime.timedelta] = None):
         self.ignore_older_than = ignore_older_than
@@ -279,10 +449,12 @@ class MempoolRejectListener(Listener):
     5bff289c800bb1ddf4f3e82ae2964b968d3ffa718e7481f560130060102e9711 from peer=12 was not accepted: insufficient fee, rejecting replacement 5bff289c800bb1ddf4f3e82ae2964b968d3ffa718e7481f560130060102e9711, not enough additional fees to relay; 0.00 < 0.00009128
     """
 
+    keywords = (" was not accepted:",)
+
     def __init__(self, ignore_older_than: t.Optional[datetime.timedelta] = None):
         self.ignore_older_than = ignore_older_than
 
-    _accept_sub_patts = {
+    _accept_sub_patts = (
         _PEER_PATT,
         re.compile(
             rf"\s+(?P<txhash>{_HASH})"
@@ -294,7 +466,7 @@ class MempoolRejectListener(Listener):
         re.compile(
             rf"not enough additional fees\D+(?P<insufficient_fee>{_FLOAT})\D+(?P<old_fee>{_FLOAT})"
         ),
-    }
+    )
 
     def process_line(self, line: str) -> None | models.MempoolReject:
         if not (" was not accepted:" in line and " from peer=" in line):
@@ -351,6 +523,8 @@ class PongListener(Listener):
 
     2022-10-23T13:21:28.681866Z received: pong (8 bytes) peer=3
     """
+    keywords = (" received: pong ",)
+
     def __init__(self, ignore_older_than: t.Optional[datetime.timedelta] = None):
         self.ignore_older_than = ignore_older_than
 
@@ -381,10 +555,10 @@ class _BlockEventListener(Listener):
     event_type: str
     event_class: t.Type[BlockEvent]
 
-    _patts: set[re.Pattern[str]] = {
+    _patts: tuple[re.Pattern[str], ...] = (
         re.compile(r"\s+height=(?P<height>\d+)"),
         re.compile(rf"\s+hash=(?P<blockhash>{_HASH})"),
-    }
+    )
 
     def process_line(self, line: str) -> None | BlockEvent:
         # Ignore the duplicate "Enqueuing" lines.
@@ -404,14 +578,18 @@ class _BlockEventListener(Listener):
 class BlockDisconnectedListener(_BlockEventListener):
     event_type: str = "BlockDisconnected"
     event_class = models.BlockDisconnectedEvent
+    keywords = (" BlockDisconnected: ",)
 
 
 class BlockConnectedListener(_BlockEventListener):
     event_type: str = "BlockConnected"
     event_class = models.BlockConnectedEvent
+    keywords = (" BlockConnected: ",)
 
 
 class ReorgListener(Listener):
+    keywords = BlockDisconnectedListener.keywords + BlockConnectedListener.keywords
+
     def __init__(self) -> None:
         self.disconnects: list[models.BlockDisconnectedEvent] = []
         self.replacements: list[models.BlockConnectedEvent] = []
@@ -488,32 +666,42 @@ class ReorgListener(Listener):
 
 
 class ConnectBlockListener(Listener):
-    _detail_patts = {
-        re.compile(
-            rf"- Load block from disk: (?P<load_block_from_disk_time_ms>{_FLOAT})ms "
-        ),
-        re.compile(rf"- Sanity checks: (?P<sanity_checks_time_ms>{_FLOAT})ms "),
-        re.compile(rf"- Fork checks: (?P<fork_checks_time_ms>{_FLOAT})ms "),
-        re.compile(
-            rf"- Connect (?P<tx_count>\d+) transactions: (?P<connect_txs_time_ms>{_FLOAT})ms "
-        ),
-        re.compile(
-            rf"- Verify (?P<txin_count>\d+) txins: (?P<verify_time_ms>{_FLOAT})ms "
-        ),
-        re.compile(rf"- Index writing: (?P<index_writing_time_ms>{_FLOAT})ms "),
-        re.compile(rf"- Connect total: (?P<connect_total_time_ms>{_FLOAT})ms "),
-        re.compile(rf"- Flush: (?P<flush_coins_time_ms>{_FLOAT})ms "),
-        re.compile(rf"- Writing chainstate: (?P<flush_chainstate_time_ms>{_FLOAT})ms "),
-        # UpdateTip messages are handled below.
-        re.compile(
-            rf"- Connect postprocess: (?P<connect_postprocess_time_ms>{_FLOAT})ms "
-        ),
-        re.compile(rf"- Connect block: (?P<connectblock_total_time_ms>{_FLOAT})ms "),
-    }
+    keywords = (
+        _UPDATE_TIP_START,
+        "- Load block from disk: ",
+        "- Sanity checks: ",
+        "- Fork checks: ",
+        "- Connect ",
+        "- Verify ",
+        "- Index writing: ",
+        "- Flush: ",
+        "- Writing chainstate: ",
+    )
+
+    # All of the detail lines are alternated into a single pattern so that each line
+    # costs one regex search rather than one per pattern.
+    _detail_patt = re.compile(
+        "|".join(
+            (
+                rf"- Load block from disk: (?P<load_block_from_disk_time_ms>{_FLOAT})ms ",
+                rf"- Sanity checks: (?P<sanity_checks_time_ms>{_FLOAT})ms ",
+                rf"- Fork checks: (?P<fork_checks_time_ms>{_FLOAT})ms ",
+                rf"- Connect (?P<tx_count>\d+) transactions: (?P<connect_txs_time_ms>{_FLOAT})ms ",
+                rf"- Verify (?P<txin_count>\d+) txins: (?P<verify_time_ms>{_FLOAT})ms ",
+                rf"- Index writing: (?P<index_writing_time_ms>{_FLOAT})ms ",
+                rf"- Connect total: (?P<connect_total_time_ms>{_FLOAT})ms ",
+                rf"- Flush: (?P<flush_coins_time_ms>{_FLOAT})ms ",
+                rf"- Writing chainstate: (?P<flush_chainstate_time_ms>{_FLOAT})ms ",
+                # UpdateTip messages are handled below.
+                rf"- Connect postprocess: (?P<connect_postprocess_time_ms>{_FLOAT})ms ",
+                rf"- Connect block: (?P<connectblock_total_time_ms>{_FLOAT})ms ",
+            )
+        )
+    )
 
     # 'UpdateTip: ...' subpatterns. Grab whatever of this we can - lot of
     # variation between versions.
-    _update_tip_sub_patts = {
+    _update_tip_sub_patts = (
         re.compile(rf"new\s+best=(?P<blockhash>{_HASH})\s+"),
         re.compile(r"\s+height=(?P<height>\d+)\s+"),
         # version only present in 0.13+
@@ -529,7 +717,7 @@ class ConnectBlockListener(Listener):
         re.compile(rf"\s+warning='(?P<warning>{_NOT_QUOTE})'"),
         re.compile(r"\s+cache=(?P<cachesize_txo>\d+)\s*$"),
         re.compile(rf"\s+log2_work=(?P<log2_work>{_FLOAT}) "),
-    }
+    )
 
     match_types = {
         float: (
@@ -606,14 +794,17 @@ class ConnectBlockListener(Listener):
 
         # The rest of the code handles creation of ConnectBlockDetails.
 
-        for patt in self._detail_patts:
-            if match := patt.search(line):
-                matchgroups.update(match.groupdict())
-                break
+        # Every detail line ends its timing in "ms ", whereas most of the lines we're
+        # handed (e.g. AcceptToMemoryPool) don't; skip the regex for those.
+        if "ms " not in line:
+            return None
 
-        if not matchgroups:
+        if not (match := self._detail_patt.search(line)):
             return None
 
+        # Only the groups of the alternative that matched are populated.
+        matchgroups = {k: v for k, v in match.groupdict().items() if v is not None}
+
         dict_onto_event(matchgroups, self.next_details, self.match_types)
 
         # Event is ready for persisting!
@@ -664,10 +855,12 @@ def dict_onto_event(d: dict[str, str], event: t.Any, type_map: t.Any) -> None:
 
 class BlockDownloadTimeoutListener(Listener):
 
-    _timeout_patts = {
+    keywords = ("Timeout downloading block ",)
+
+    _timeout_patts = (
         re.compile(rf"block (?P<blockhash>{_HASH})"),
         _PEER_PATT,
-    }
+    )
 
     def __init__(self, ignore_older_than: t.Optional[datetime.timedelta] = None):
         self.ignore_older_than = ignore_older_than
@@ -694,22 +887,24 @@ class HeaderToTipListener(Listener):
     Saw new cmpctblock header hash= peer=12
     Successfully reconstructed block <hash> with 1 txn prefilled, 3313 txn from mempool (incl at least 0 from extra pool) and 1 txn requested
     """
-    _header_patts = {
+    keywords = ("Saw new header", "Successfully reconstructed block", "UpdateTip: ")
+
+    _header_patts = (
         re.compile(rf"hash=(?P<blockhash>{_HASH})"),
         re.compile(r"height=(?P<height>\d+)"),
-    }
+    )
 
-    _reconstruct_patts = {
+    _reconstruct_patts = (
         re.compile(fr"block (?P<blockhash>{_HASH})"),
         re.compile(r"(?P<num_prefilled>\d+) txn prefilled"),
         re.compile(r"(?P<num_from_mempool>\d+) txn from mempool"),
         re.compile(r"(?P<num_requested>\d+) txn requested"),
-    }
+    )
 
-    _tip_patts = {
+    _tip_patts = (
         re.compile(fr"best=(?P<blockhash>{_HASH}) "),
         re.compile(r"date='(?P<blocktime>\S+)'"),
-    }
+    )
 
     def __init__(self) -> None:
         self.next_event = None
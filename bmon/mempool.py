@@ -6,7 +6,7 @@ import logging
 import json
 import typing as t
 from enum import Enum
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from collections import defaultdict
 from functools import cache, cached_property
 
@@ -43,7 +43,8 @@ class PolicyCohort(str, Enum):
 
     @classmethod
     def hostnames_for_policy(cls, policy: "PolicyCohort") -> t.Set[str]:
-        pairs = list(models.Host.objects.values_list('name', 'bitcoin_version'))
+        # Hosts accumulate a row per config change, but most share versions.
+        pairs = models.Host.objects.values_list('name', 'bitcoin_version').distinct()
         return {name for name, ver in pairs if cls.for_version(ver) == policy}
 
 
@@ -55,7 +56,9 @@ class PropagationStatus(str, Enum):
     CompleteCohort = "complete_cohort"
 
 
-@dataclass(frozen=True, eq=True)
+# Slotted, since one of these is built for every propagated txid that gets read back
+# out of redis.
+@dataclass(frozen=True, eq=True, slots=True)
 class TxPropagation:
     """
     Various statistics around how a single tx propagated.
@@ -75,20 +78,24 @@ class TxPropagation:
     # The length of the examination period
     time_window: float
 
-    @cached_property
+    # Plain properties, since there's no instance `__dict__` for `cached_property`
+    # to store into. `host_to_timestamp` only has an entry per host, so these are
+    # cheap to recompute.
+    @property
     def earliest_saw(self) -> float:
         return min(self.host_to_timestamp.values())
 
-    @cached_property
+    @property
     def latest_saw(self) -> float:
         return max(self.host_to_timestamp.values())
 
-    @cached_property
+    @property
     def spread(self) -> float:
         return self.latest_saw - self.earliest_saw
 
     def asdict(self):
-        return self.__dict__
+        # A new dict each time, so callers can't alter the instance through it.
+        return {f.name: getattr(self, f.name) for f in fields(self)}
 
     @classmethod
     def from_redis(cls, s: str) -> "TxPropagation":
@@ -96,7 +103,7 @@ class TxPropagation:
 
     def __hash__(self):
         # TODO this is a hack
-        return hash(str(self.__dict__))
+        return hash(str(self.asdict()))
 
 
 class MempoolAcceptAggregator:
@@ -117,7 +124,13 @@ class MempoolAcceptAggregator:
         self.redis = redisdb
         self.host_to_cohort = host_to_cohort
 
-    @cache
+        # Built once per instance. (A `functools.cache` on these methods would
+        # hold a reference to every aggregator ever created, and one is created
+        # every time `get_mempool_aggregator()` refreshes.)
+        self._hosts_by_cohort: dict[PolicyCohort, set[str]] = {}
+        for h, c in host_to_cohort.items():
+            self._hosts_by_cohort.setdefault(c, set()).add(h)
+
     def cohort(self, host: str) -> set[str]:
         return self.hosts_for_cohort(self.host_to_cohort[host])
 
@@ -125,11 +138,8 @@ class MempoolAcceptAggregator:
     def cohorts(self) -> set[PolicyCohort]:
         return set(self.host_to_cohort.values())
 
-    @cache
     def hosts_for_cohort(self, cohort: PolicyCohort) -> set[str]:
-        return {
-            h for h in self.host_to_cohort.keys() if self.host_to_cohort[h] == cohort
-        }
+        return self._hosts_by_cohort.get(cohort, set())
 
     @cached_property
     def host_names(self) -> set[str]:
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bmon', '0027_mempoolreject_wtxid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='connectblockevent',
+            index=models.Index(fields=['height'], name='bmon_connec_height_1a2a72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='headertotipevent',
+            index=models.Index(fields=['height'], name='bmon_header_height_4ff17f_idx'),
+        ),
+    ]
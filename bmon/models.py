@@ -3,6 +3,7 @@ from django.db import models
 from django.conf import settings
 
 import logging
+from functools import cache
 
 log = logging.getLogger(__name__)
 
@@ -14,6 +15,17 @@ def _repr(instance, attrs):
     return f'{instance.__class__.__name__}({" ".join(attr_strs)})'
 
 
+@cache
+def _event_fields(model_cls: type[models.Model]) -> tuple[str, ...]:
+    """The attnames of the fields that `model_to_dict()` would serialize."""
+    return tuple(f.attname for f in model_cls._meta.concrete_fields if f.editable)
+
+
+@cache
+def _fk_names(model_cls: type[models.Model]) -> tuple[str, ...]:
+    return tuple(f.name for f in model_cls._meta.concrete_fields if f.is_relation)
+
+
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, blank=True)
 
@@ -26,6 +38,29 @@ class BaseModel(models.Model):
         have to be handled specially."""
         return False
 
+    def to_event_dict(self) -> dict:
+        """
+        Like `django.forms.models.model_to_dict()`, but without walking the model's
+        fields on every call, and keyed by attname (e.g. `host_id`) so that the
+        result can be passed straight to `objects.create()`.
+        """
+        return {attname: getattr(self, attname) for attname in _event_fields(type(self))}
+
+    def clean_event(self) -> None:
+        """
+        Validate an event parsed from the logs before it's sent off to be persisted.
+
+        This skips the checks that need to query the database: foreign keys (validating
+        one fetches the related row, and ours are set from records we just looked up),
+        uniqueness, and constraints. The database enforces all of these when the
+        server persists the event.
+        """
+        self.full_clean(
+            exclude=_fk_names(type(self)),
+            validate_unique=False,
+            validate_constraints=False,
+        )
+
 
 class LogProgress(models.Model):
     """
@@ -139,11 +174,16 @@ class Peer(BaseModel):
         ]
 
     @classmethod
-    def peerinfo_data(cls, p: dict) -> tuple[dict, dict]:
-        """Return the subset of getpeerinfo data that is relevant to this model."""
+    def peerinfo_data(cls, p: dict, host: "Host | None" = None) -> tuple[dict, dict]:
+        """
+        Return the subset of getpeerinfo data that is relevant to this model.
+
+        Kwargs:
+            host: the Host these peers belong to; looked up if not given.
+        """
         out = {k: p.get(k) for k in PEER_UNIQUE_TOGETHER_FIELDS if k in p}
         out["num"] = p["id"]
-        out["host"] = (
+        out["host"] = host or (
             Host.objects.filter(name=settings.HOSTNAME).order_by("-id").first()
         )
 
@@ -286,6 +326,11 @@ class ConnectBlockEvent(BaseModel):
     cachesize_txo = models.IntegerField()
     warning = models.CharField(null=True, blank=True, max_length=1024)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['height']),
+        ]
+
     def __repr__(self):
         return _repr(self, ["host", "timestamp", "height", "blockhash"])
 
@@ -460,6 +505,11 @@ class HeaderToTipEvent(BaseModel):
         default=dict, blank=True,
         help_text="Extra data associated with the block reconstruction")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['height']),
+        ]
+
     def __repr__(self):
         return _repr(self, ["host", "blockhash", "saw_header_at", "header_to_tip_secs"])
 
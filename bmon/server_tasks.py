@@ -14,6 +14,7 @@ from collections import defaultdict
 import django
 import redis
 from django.conf import settings
+from django.db import close_old_connections
 from huey import RedisHuey, crontab
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bmon.settings")
@@ -25,9 +26,13 @@ from .hosts import get_bitcoind_hosts_to_policy_cohort
 
 log = logging.getLogger(__name__)
 
+# The queues share a connection pool. It can't be shared with `redisdb` because huey
+# needs responses undecoded.
+huey_pool = redis.ConnectionPool.from_url(settings.REDIS_SERVER_URL)
+
 server_q = RedisHuey(
     "bmon-server",
-    url=settings.REDIS_SERVER_URL,
+    connection_pool=huey_pool,
     immediate=settings.TESTING,
     duration_warn=5,  # warn if task takes longer than 5 seconds
 )
@@ -36,7 +41,7 @@ server_q = RedisHuey(
 # wrong, we don't want to disrupt other event types.
 mempool_q = RedisHuey(
     "bmon-server-mempool",
-    url=settings.REDIS_SERVER_URL,
+    connection_pool=huey_pool,
     immediate=settings.TESTING,
     results=False,
     duration_warn=5,  # warn if task takes longer than 5 seconds
@@ -45,6 +50,22 @@ mempool_q = RedisHuey(
 redisdb = redis.Redis.from_url(settings.REDIS_SERVER_URL, decode_responses=True)
 
 
+def close_old_db_connections(_task) -> None:
+    """
+    Treat each task like Django treats a request: drop any database connection that
+    has outlived CONN_MAX_AGE or errored, so that the next query reconnects (or
+    health-checks a reused connection) rather than failing.
+    """
+    # Tests run tasks immediately, inside a test's transaction, which this would
+    # otherwise close out from under them.
+    if not settings.TESTING:
+        close_old_connections()
+
+
+server_q.pre_execute()(close_old_db_connections)
+mempool_q.pre_execute()(close_old_db_connections)
+
+
 def get_mempool_aggregator() -> mempool.MempoolAcceptAggregator:
     """
     Cache this for 90 seconds; we want to refresh periodically in case host versions
@@ -70,7 +91,8 @@ def get_mempool_aggregator() -> mempool.MempoolAcceptAggregator:
 @server_q.periodic_task(crontab(minute="*/10"))
 def check_for_overlapping_peers():
     def getpeerinfo(rpc):
-        return rpc.getpeerinfo()
+        # We only need addresses; skip Decimal parsing.
+        return rpc.getpeerinfo(decimal=False)
 
     results = bitcoin.gather_rpc(getpeerinfo)
     peer_to_hosts = defaultdict(list)
@@ -99,13 +121,11 @@ def persist_bitcoind_event(event: dict, _: str):
     modelname = event.pop("_model")
     Model = getattr(models, modelname)
 
-    if Model == models.MempoolReject:
-        # XXX this is an ugly hack: Django doesn't suffix with "_id" in `model_to_dict`;
-        # come up with a better way of dealing with this.
-        event["peer_id"] = event.pop("peer")
-
-    if "host" in event:
-        event["host_id"] = event.pop("host")
+    # Events queued by older workers were keyed by field name (via `model_to_dict`)
+    # rather than attname.
+    for fk in ("host", "peer"):
+        if fk in event:
+            event[f"{fk}_id"] = event.pop(fk)
 
     instance = Model.objects.create(**event)
     print(f"Saved {instance}")
@@ -50,6 +50,10 @@ BITCOIND_LOG_PATH = os.environ.get('BMON_BITCOIND_LOG_PATH')
 CHAINCODE_GCP_CRED_PATH = os.environ.get('CHAINCODE_GCP_CRED_PATH')
 CHAINCODE_GCP_BUCKET = 'mempool-event-logs'
 
+# For alerting on notable chain events (see `util.pushover_notification()`).
+PUSHOVER_TOKEN = os.environ.get('PUSHOVER_TOKEN')
+PUSHOVER_USER = os.environ.get('PUSHOVER_USER')
+
 # For testing
 LOCALHOST_AUTH_TOKEN = '4396049cdfe946f88ec63da115cbcfcf'
 
@@ -165,6 +169,10 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'FIXME'),
         'HOST': os.environ.get('DB_HOST', 'FIXME'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open across requests rather than reconnecting for each
+        # one, and verify a reused connection before handing it out.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
     },
 }
 
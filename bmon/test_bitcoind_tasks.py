@@ -1,6 +1,6 @@
 import pytest
 
-from . import bitcoind_tasks, conftest
+from . import bitcoind_tasks, conftest, models
 
 
 @pytest.mark.django_db
@@ -62,3 +62,23 @@ def test_peerstats():
     assert got.ping_max == 0.216082
     assert got.ping_mean == 0.0859731
     assert got.ping_min == 0.008235
+
+
+@pytest.mark.django_db
+def test_commit_peers_db_existing(monkeypatch):
+    peerdata = conftest.read_json_data("getpeerinfo.json")
+    bitcoind_tasks.create_host_record()
+
+    new_ids = bitcoind_tasks.commit_peers_db(peerdata)
+    assert len(new_ids) == len(peerdata)
+    num_peers = models.Peer.objects.count()
+
+    # Unchanged peers should all be matched from the prefetched rows, without falling
+    # back to get_or_create().
+    def fail(*args, **kwargs):
+        raise AssertionError("get_or_create() called for an existing peer")
+
+    monkeypatch.setattr(models.Peer.objects, "get_or_create", fail)
+
+    assert bitcoind_tasks.commit_peers_db(peerdata) == {}
+    assert models.Peer.objects.count() == num_peers
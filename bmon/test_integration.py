@@ -1,4 +1,5 @@
 
+import fastavro
 import pytest
 
 
@@ -26,3 +27,43 @@ def test_process_mempool_accepts(fake_hosts):
         'bitcoind': 50,
         'bitcoind-02': 50,
     }
+
+
+@pytest.mark.django_db
+def test_mempool_activity_flush(fake_hosts, monkeypatch, tmp_path):
+    monkeypatch.setattr(bitcoind_tasks, "CURRENT_MEMPOOL_FILE", tmp_path / "current")
+    # Flush a few times along the way, each in more than one chunk.
+    monkeypatch.setattr(bitcoind_tasks, "MEMPOOL_FLUSH_AT_RECORDS", 20)
+    monkeypatch.setattr(bitcoind_tasks, "MEMPOOL_FLUSH_MAX_RECORDS", 8)
+    redisdb = bitcoind_tasks.redisdb
+    logdata = conftest.read_data_file("mempool-accepts-log.txt")
+
+    for line in logdata:
+        bitcoind_tasks.process_line(line, fake_hosts[0])
+
+    assert 0 < redisdb.llen(bitcoind_tasks.MEMPOOL_BUFFER_KEY) < 20
+
+    # Records that can't be written are dropped rather than blocking the ones
+    # behind them.
+    good = redisdb.lrange(bitcoind_tasks.MEMPOOL_BUFFER_KEY, 0, -1)
+    redisdb.delete(bitcoind_tasks.MEMPOOL_BUFFER_KEY)
+    redisdb.rpush(bitcoind_tasks.MEMPOOL_BUFFER_KEY, '{"txhash": "bad"}', "not json")
+    redisdb.rpush(bitcoind_tasks.MEMPOOL_BUFFER_KEY, *good)
+
+    # A flush only drains so many chunks.
+    monkeypatch.setattr(bitcoind_tasks, "MEMPOOL_FLUSH_MAX_CHUNKS", 1)
+    bitcoind_tasks.flush_mempool_activity_blocking()
+    assert redisdb.llen(bitcoind_tasks.MEMPOOL_BUFFER_KEY) == len(good) + 2 - 8
+
+    monkeypatch.setattr(bitcoind_tasks, "MEMPOOL_FLUSH_MAX_CHUNKS", 10)
+    bitcoind_tasks.flush_mempool_activity_blocking()
+    assert redisdb.llen(bitcoind_tasks.MEMPOOL_BUFFER_KEY) == 0
+
+    with open(tmp_path / "current", "rb") as f:
+        reader = fastavro.reader(f)
+        assert reader.codec == "deflate"
+        records = list(reader)
+
+    assert len(records) == 50
+    assert len({r["txhash"] for r in records}) == 50
+    assert {r["host"] for r in records} == {fake_hosts[0].name}
@@ -316,3 +316,22 @@ def test_connectblockevent():
 
         if version >= 0.18:
             assert cb.cachesize_mib is not None
+
+
+def test_find_cursor_pos(tmp_path):
+    logfile = tmp_path / "debug.log"
+    lines = [f"line {i}" for i in range(100)]
+    logfile.write_text("\n".join(lines) + "\n")
+
+    for i, line in enumerate(lines):
+        # Small chunks so that lines straddle chunk boundaries.
+        pos = logparse._find_cursor_pos(logfile, logparse.linehash(line), chunk_size=7)
+        assert pos == len("\n".join(lines[:i + 1]) + "\n")
+
+    assert logparse._find_cursor_pos(logfile, logparse.linehash("nope")) is None
+
+    # CRLF line endings and invalid UTF-8 are normalized away by the text-mode
+    # reader that the cursor's hash came from.
+    logfile.write_bytes(b"line a\r\nline \xff b\nline c\n")
+    assert logparse._find_cursor_pos(logfile, logparse.linehash("line a")) == 8
+    assert logparse._find_cursor_pos(logfile, logparse.linehash("line  b")) == 17
@@ -7,10 +7,10 @@ import pstats
 import huey
 import http.client
 import urllib
-import os
 import logging
 from collections import Counter
 
+from django.conf import settings
 from django.db import models
 from django.db.models.sql.query import Query
 
@@ -107,7 +107,7 @@ def remove_mempool_events(q: huey.RedisHuey):
 
 
 def pushover_notification(msg: str) -> bool:
-    token = os.environ.get("PUSHOVER_TOKEN")
+    token = settings.PUSHOVER_TOKEN
 
     if not token:
         log.error("no pushover token configured")
@@ -121,7 +121,7 @@ def pushover_notification(msg: str) -> bool:
             urllib.parse.urlencode(
                 {
                     "token": token,
-                    "user": os.environ.get("PUSHOVER_USER"),
+                    "user": settings.PUSHOVER_USER,
                     "message": msg,
                 }
             ),
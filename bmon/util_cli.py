@@ -68,6 +68,7 @@ def shipmempool() -> None:
     """Ship off mempool activity to GCP."""
     assert bitcoind_tasks
     bitcoind_tasks.mempool_q.immediate = True
+    bitcoind_tasks.flush_mempool_activity_blocking()
     bitcoind_tasks.queue_mempool_to_ship()
     bitcoind_tasks.ship_mempool_activity()
 
@@ -97,7 +98,7 @@ def wait_for_bitcoind_sync() -> None:
 
 @cli.cmd
 def compare_mempools() -> None:
-    mempools = gather_rpc("getrawmempool")
+    mempools = gather_rpc(lambda rpc: rpc.getrawmempool(decimal=False))
     host_to_set = {}
 
     for host, res in mempools.items():
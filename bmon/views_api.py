@@ -19,7 +19,7 @@ def _get_wireguard_ip(host):
 
 
 def _get_db_hosts() -> dict[str, models.Host]:
-    bitcoind_hosts = {h.name for h in config.get_hosts()[1].values() if "bitcoind" in h.tags}
+    bitcoind_hosts = {h.name for h in config.get_bitcoind_hosts()}
     latest_ids = (
         models.Host.objects.values("name")
         .annotate(max_id=Max("id"))
@@ -34,7 +34,7 @@ def _get_db_hosts() -> dict[str, models.Host]:
 @api.get("/prom-config-bitcoind")
 def prom_config_bitcoind(_):
     """Dynamic configuration for bitcoind prometheus monitoring endpoints."""
-    bitcoind_hosts = [h for h in config.get_hosts()[1].values() if "bitcoind" in h.tags]
+    bitcoind_hosts = config.get_bitcoind_hosts()
     db_hosts = _get_db_hosts()
     out = []
 
@@ -89,16 +89,24 @@ def hosts(_):
     out = []
     hosts = config.get_bitcoind_hosts()
     db_hosts = _get_db_hosts()
-    peer_info = gather_rpc(lambda r: r.getpeerinfo())
-    chain_info = gather_rpc(lambda r: r.getblockchaininfo())
+    # One batched request per host for both calls, but handle their failures
+    # separately: a host is still listed if only getpeerinfo fails.
+    host_to_info = gather_rpc(
+        lambda r: r.call_batch(
+            [("getpeerinfo", ()), ("getblockchaininfo", ())], return_exceptions=True
+        )
+    )
 
     for host in hosts:
-        peers = peer_info[host.name]
-        if peers == RPC_ERROR_RESULT:
+        info = host_to_info[host.name]
+        if info == RPC_ERROR_RESULT:
+            continue
+
+        peers, chain = info
+        if isinstance(peers, Exception):
             peers = []
 
-        chain = chain_info[host.name]
-        if chain == RPC_ERROR_RESULT:
+        if isinstance(chain, Exception):
             continue
 
         out.append(
@@ -14,6 +14,7 @@ import socket
 import getpass
 import json
 import os
+import shutil
 import typing as t
 from typing import Optional as Op
 from string import Template
@@ -91,6 +92,9 @@ CHAINCODE_GCP_CRED_PATH=/chaincode-gcp.json
 SENTRY_DSN=${sentry_dsn}
 """
 
+# Built once rather than per host rendered.
+_ENV_TEMPLATE = Template(env_template)
+
 
 DEV_HOSTS_FILE = "./infra/hosts_dev.yml"
 
@@ -199,16 +203,33 @@ def get_dev_host() -> Host:
     ][0]
 
 
+# Keyed by hosts file; each entry is (mtime_ns, hosts).
+_BITCOIND_HOSTS_CACHE: t.Dict[Path, t.Tuple[int, t.Tuple[Host, ...]]] = {}
+
+
 def get_bitcoind_hosts() -> t.Tuple[Host, ...]:
-    hosts = get_hosts()[1].values()
-    return tuple(h for h in hosts if "bitcoind" in h.tags)
+    """
+    Return the bitcoind hosts. This is called from API views and on every
+    `gather_rpc()`, so the parsed hosts are reused until the hosts file changes.
+    Callers must treat them as read-only.
+    """
+    hostsfile = Path(os.environ["BMON_HOSTS_FILE"])
+    mtime = hostsfile.stat().st_mtime_ns
+
+    if (cached := _BITCOIND_HOSTS_CACHE.get(hostsfile)) and cached[0] == mtime:
+        return cached[1]
+
+    hosts = get_hosts(str(hostsfile))[1].values()
+    bitcoind_hosts = tuple(h for h in hosts if "bitcoind" in h.tags)
+    _BITCOIND_HOSTS_CACHE[hostsfile] = (mtime, bitcoind_hosts)
+    return bitcoind_hosts
 
 
 def dev_env(host) -> str:
     dev_settings.update(get_bitcoin_image_labels(host))
     dev_settings.update(
         bitcoin_docker_tag=host.bitcoin_docker_tag)
-    return Template(env_template).substitute(**dev_settings)
+    return _ENV_TEMPLATE.substitute(**dev_settings)
 
 
 def get_bitcoin_image_labels(host) -> dict:
@@ -235,14 +256,18 @@ def get_bitcoin_image_labels(host) -> dict:
 def prod_settings(host, server_wireguard_ip: str) -> dict:
     # Don't print to console in prod; everything is done on the basis of the debug.log
     # anyway, so the stdout will just waste journald space.
-    bitcoin_flags = f"-printtoconsole=0 {host.bitcoin_extra_args or ''}".strip()
+    flags = ["-printtoconsole=0"]
 
+    if host.bitcoin_extra_args and host.bitcoin_extra_args.strip():
+        flags.append(host.bitcoin_extra_args.strip())
     if host.bitcoin_prune is not None:
-        bitcoin_flags += f" -prune={host.bitcoin_prune}"
+        flags.append(f"-prune={host.bitcoin_prune}")
     if host.bitcoin_dbcache is not None:
-        bitcoin_flags += f" -dbcache={host.bitcoin_dbcache}"
+        flags.append(f"-dbcache={host.bitcoin_dbcache}")
     if host.bitcoin_listen:
-        bitcoin_flags += " -listen=1"
+        flags.append("-listen=1")
+
+    bitcoin_flags = " ".join(flags)
 
     settings = dict(dev_settings)
     settings.update(
@@ -308,7 +333,7 @@ def prod_settings(host, server_wireguard_ip: str) -> dict:
 
 def prod_env(host, server_wireguard_ip: str) -> str:
     settings = prod_settings(host, server_wireguard_ip)
-    return Template(env_template).substitute(**settings)
+    return _ENV_TEMPLATE.substitute(**settings)
 
 
 def template_with_env(file_path: str) -> str:
@@ -317,12 +342,13 @@ def template_with_env(file_path: str) -> str:
 
 def get_bitcoind_auth_line(username: str, password: str):
     """Copied from `./share/rpcauth/rpcauth.py`"""
+    import hashlib
     import hmac
 
     # Normally fixing the salt wouldn't be advisable, but we want the conf file to be
     # deterministic.
     salt = "a05b6fb53780e0b460cdd7387287f426"
-    m = hmac.new(bytearray(salt, "utf-8"), bytearray(password, "utf-8"), "SHA256")
+    m = hmac.new(salt.encode(), password.encode(), hashlib.sha256)
     password_hmac = m.hexdigest()
     return f"rpcauth={username}:{salt}${password_hmac}"
 
@@ -337,15 +363,15 @@ def make_services_data(envtype: str):
     p(grafetc / "grafana.ini").contents(template_with_env("./etc/grafana-template.ini"))
     p(var := root / "grafana" / "var").mkdir()
     p(dashboards := var / "dashboards").mkdir()
-    p(dashboards / "bitcoind.json").contents(
-        Path("./etc/grafana/dashboards/bitcoind.json").read_text()
+    # Verbatim copies don't need fscm's change tracking (nothing reacts to them
+    # changing), so just copy them.
+    shutil.copyfile(
+        "./etc/grafana/dashboards/bitcoind.json", dashboards / "bitcoind.json"
     )
     p(prov := grafetc / "provisioning").mkdir()
     p(datasources := prov / "datasources").mkdir()
     p(dashprov := prov / "dashboards").mkdir()
-    p(dashprov / "default.yml").contents(
-        Path("./etc/grafana-dashboards-template.yml").read_text()
-    )
+    shutil.copyfile("./etc/grafana-dashboards-template.yml", dashprov / "default.yml")
     p(datasources / "datasource.yml").contents(
         template_with_env("./etc/grafana-datasources-template.yml")
     )
@@ -359,7 +385,7 @@ def make_services_data(envtype: str):
     p(prometc := root / "prom" / "etc").mkdir()
     p(root / "prom" / "data").mkdir()
     p(prometc / "prometheus.yml").contents(template_with_env("./etc/prom-template.yml"))
-    p(prometc / "alerts.yml").contents(Path("./etc/prom-alerts.yml").read_text())
+    shutil.copyfile("./etc/prom-alerts.yml", prometc / "alerts.yml")
 
     p(am := root / "alertman").mkdir()
     p(am / "data").mkdir().chown(f"{user}:{user}")
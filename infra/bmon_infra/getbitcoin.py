@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import os
+import hashlib
+import tarfile
 import sys
 import argparse
 import typing as t
@@ -62,18 +64,33 @@ def download_bitcoind(release: Release, dest: t.Optional[Path] = None):
     if not Path(filename).exists():
         run(f'wget {release.url}').assert_ok()
 
-    hash = run(f'sha256sum {filename}').assert_ok()
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            sha256.update(chunk)
 
-    if (got_hash := hash.stdout.split()[0]) != release.sha256:
+    if (got_hash := sha256.hexdigest()) != release.sha256:
         raise RuntimeError(
             f"incorrect hash found for {filename}: {got_hash} "
             f"(expected {release.sha256})")
 
-    run(f'tar xvf {filename}').assert_ok()
     dirname = 'bitcoin-' + filename.lstrip('bitcoin-').split('-')[0]
     if not dest.exists():
         p(dest).mkdir()
-    run(f'mv {dirname}/bin/* {dest}').assert_ok()
+
+    # Only the binaries are wanted, so extract just those, straight into `dest`,
+    # rather than unpacking the whole release (headers, libs, man pages) first.
+    with tarfile.open(filename) as tar:
+        bins = [m for m in tar.getmembers() if m.name.startswith(f'{dirname}/bin/')]
+        for member in bins:
+            member.name = Path(member.name).name
+        # The "data" filter refuses anything unsafe (absolute paths, special files,
+        # links out of `dest`) and is the default from Python 3.14; it's only missing
+        # on Python releases that predate tarfile extraction filters.
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(dest, members=bins, filter='data')
+        else:
+            tar.extractall(dest, members=bins)
 
 
 def main():
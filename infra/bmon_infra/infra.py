@@ -6,6 +6,8 @@ import sys
 import json
 import subprocess
 import getpass
+import glob
+import shutil
 import re
 import typing as t
 from pathlib import Path
@@ -40,6 +42,30 @@ SERVER_EXPORTER_PORT = 9334
 
 BMON_SSHPUBKEY = Path.home() / ".ssh" / "bmon-ed25519.pub"
 
+# Summarizes the state of each bmon container, with compose's name decorations
+# stripped.
+DOCKER_STATUS_CMD = (
+    'docker ps -a --filter "network=bmon_default" '
+    r'--format "{{.State}}\t\t{{.RunningFor}}\t\t{{.Names}}" | '
+    'sort | sed -e "s/bmon_//" | sed -Ee "s/_[0-9]+//"'
+)
+
+LOGROTATE_TIMER = dedent(
+    """
+    [Unit]
+    Description=Hourly rotation of log files
+    Documentation=man:logrotate(8) man:logrotate.conf(5)
+
+    [Timer]
+    OnCalendar=hourly
+    AccuracySec=1h
+    Persistent=true
+
+    [Install]
+    WantedBy=timers.target
+    """
+)
+
 
 def get_server_wireguard_ip() -> str:
     [server_host] = [h for h in get_hosts()[1].values() if "server" in h.tags]
@@ -145,10 +171,12 @@ def main_remote(
     if ".venv/bin/" not in os.environ["PATH"]:
         os.environ["PATH"] = f"{VENV_PATH / 'bin'}:{os.environ['PATH']}"
 
-    if not run("which bmon-config", check=False, quiet=True).ok:
+    # Checked in-process (against the PATH amended above) rather than by shelling out
+    # to `which`.
+    if not shutil.which("bmon-config"):
         run(f"cd {BMON_PATH} && pip install -e ./infra")
 
-    if not run("which docker-compose", check=False, quiet=True).ok:
+    if not shutil.which("docker-compose"):
         run("pip install docker-compose")
 
     run(f"cd {BMON_PATH} && git reset --hard HEAD && git pull --ff-only origin master")
@@ -176,6 +204,12 @@ def main_remote(
         )
 
 
+def _recreate_services(docker_compose: t.Union[str, Path], services: str):
+    # One pass, in which compose recreates the containers in parallel, rather than
+    # three (stop, rm, up) that each wait on every service.
+    run(f"{docker_compose} up -d --force-recreate {services}")
+
+
 def provision_bmon_server(
     host: Host,
     parent: fscm.remote.Parent,
@@ -257,20 +291,15 @@ def provision_bmon_server(
     run(f"{docker_compose} pull {always}")
     run(f"{docker_compose} run --rm web ./manage.py migrate")
 
-    def cycle(services):
-        run(f"{docker_compose} stop {services}")
-        run(f"{docker_compose} rm -f {services}")
-        run(f"{docker_compose} up -d {services}")
-
     if restart_spec == "":
-        cycle(always)
+        _recreate_services(docker_compose, always)
     elif restart_spec == "none":
         pass
     elif restart_spec == "all":
         run("systemctl --user restart bmon-server")
     else:
         run(f"{docker_compose} pull {restart_spec}")
-        cycle(f"{always} {restart_spec}")
+        _recreate_services(docker_compose, f"{always} {restart_spec}")
 
 
 def provision_monitored_bitcoind(
@@ -285,9 +314,9 @@ def provision_monitored_bitcoind(
     assert docker_compose.exists()
 
     # We can't use docker-compose yet because the .env file may not necessarily exist
-    # yet, or it may be out of date in terms of the desired bitcoind version.
-    run(f"docker pull {host.bitcoin_docker_tag}")
-
+    # yet, or it may be out of date in terms of the desired bitcoind version. Rendering
+    # the .env pulls the image itself (to read its version labels), so there's no need
+    # to pull it separately here.
     os.chdir(BMON_PATH)
     p(BMON_PATH / ".env").contents(config.prod_env(host, server_wg_ip)).chmod("600")
     run("bmon-config -t prod")
@@ -303,23 +332,7 @@ def provision_monitored_bitcoind(
 
     if (
         p("/etc/systemd/system/timers.target.wants/logrotate.timer", sudo=True)
-        .content(
-            dedent(
-                """
-        [Unit]
-        Description=Hourly rotation of log files
-        Documentation=man:logrotate(8) man:logrotate.conf(5)
-
-        [Timer]
-        OnCalendar=hourly
-        AccuracySec=1h
-        Persistent=true
-
-        [Install]
-        WantedBy=timers.target
-        """
-            )
-        ).chmod(755).chown("root:root")
+        .content(LOGROTATE_TIMER).chmod(755).chown("root:root")
         .changes
     ):
         run("systemctl daemon-reload", sudo=True)
@@ -354,8 +367,7 @@ def provision_monitored_bitcoind(
         # Sync to tip so that we don't generate a bunch of spurious events
 
         # Ensure we're using the right config
-        run(f"rm -f {btc_data}/bitcoin.conf")
-        run(f"rm -f {btc_data}/debug.log")
+        run(f"rm -f {btc_data}/bitcoin.conf {btc_data}/debug.log")
         run("bmon-config -t prod")
 
         run(f"{docker_compose} pull bitcoind")
@@ -363,8 +375,7 @@ def provision_monitored_bitcoind(
         print("Syncing bitcoind instance to tip, then cycling debug.log")
         run(f"{docker_compose} run --rm shell bmon-util wait-for-bitcoind-sync")
         run(f"{docker_compose} stop bitcoind")
-        run(f"rm -f {btc_data}/debug.log")
-        run(f"touch {btc_data}/debug.log")
+        run(f"rm -f {btc_data}/debug.log && touch {btc_data}/debug.log")
 
     p(services_path / "bmon" / "credentials" / "chaincode-gcp.json").contents(
         json.dumps(host.secrets.chaincode_gcp_service_account.__dict__)  # type: ignore
@@ -387,30 +398,40 @@ def provision_monitored_bitcoind(
     # Update the docker image.
     run(f"{docker_compose} pull bitcoind-watcher bitcoind")
 
+    # Asking bitcoind for its version means starting a container, so only do that when
+    # the image has changed since the version file was last written.
     env = config.get_env_object()
-    p(env.BITCOIND_VERSION_PATH).contents(get_bitcoind_version(docker_compose))
+    version_path = Path(env.BITCOIND_VERSION_PATH)
+    image_id_path = version_path.with_name(f"{version_path.name}.image-id")
+    image_id = (
+        run(f"docker image inspect -f '{{{{.Id}}}}' {host.bitcoin_docker_tag}", q=True)
+        .assert_ok()
+        .stdout.strip()
+    )
+    if not (
+        version_path.exists()
+        and image_id_path.exists()
+        and image_id_path.read_text() == image_id
+    ):
+        p(version_path).contents(get_bitcoind_version(docker_compose))
+        p(image_id_path).contents(image_id)
 
     systemd.enable_service("bmon-bitcoind")
 
-    def cycle(services):
-        run(f"{docker_compose} stop {services}")
-        run(f"{docker_compose} rm -f {services}")
-        run(f"{docker_compose} up -d {services}")
-
     alwaysrestart = (
         "bitcoind-task-worker bitcoind-mempool-worker bitcoind-watcher "
         "bitcoind-monitor"
     )
 
     if restart_spec == "":
-        cycle(alwaysrestart)
+        _recreate_services(docker_compose, alwaysrestart)
     elif restart_spec == "none":
         pass
     elif restart_spec == "all":
         run("systemctl --user restart bmon-bitcoind")
     else:
         run(f"{docker_compose} pull {restart_spec}")
-        cycle(f"{alwaysrestart} {restart_spec}")
+        _recreate_services(docker_compose, f"{alwaysrestart} {restart_spec}")
 
 
 def get_bitcoind_version(
@@ -506,12 +527,7 @@ def deploy(
             sys.exit(2)
         else:
             time.sleep(2)
-            docker_status_cmd = (
-                'docker ps -a --filter "network=bmon_default" '
-                r'--format "{{.State}}\t\t{{.RunningFor}}\t\t{{.Names}}" | '
-                'sort | sed -e "s/bmon_//" | sed -Ee "s/_[0-9]+//"'
-            )
-            exec.run(_run_cmd, docker_status_cmd)
+            exec.run(_run_cmd, DOCKER_STATUS_CMD)
 
 
 def bootstrap_bitcoind(regular_user: str, wgs, wg, bmon_pubkey: str = ""):
@@ -632,12 +648,7 @@ def wipemempool(hostname_filt: str):
 
 @cli.cmd
 def ps():
-    docker_status_cmd = (
-        'docker ps -a --filter "network=bmon_default" '
-        r'--format "{{.State}}\t\t{{.RunningFor}}\t\t{{.Names}}" | '
-        'sort | sed -e "s/bmon_//" | sed -Ee "s/_[0-9]+//"'
-    )
-    runall(docker_status_cmd)
+    runall(DOCKER_STATUS_CMD)
 
 
 @cli.cmd
@@ -665,15 +676,20 @@ def wireguard_peer_template(hostname: str):
 
 def _run_rg(query: str, tail_limit: int, context: int, after: int, all: bool):
     os.chdir("./bmon/services/prod/bitcoin/data")
-    context_str = "" if context == -1 else f"-C {context}"
-    after_str = "" if after == -1 else f"-A {after}"
-    filename = "debug.log*" if all else "debug.log"
-
-    cmd = f"rg --color=always -z {context_str} {after_str} '{query}' {filename}"
+    # Run rg directly rather than through a shell, so that the query needs no quoting
+    # and there's no extra shell (or `tail`) process.
+    argv = ["rg", "--color=always", "-z"]
+    if context != -1:
+        argv += ["-C", str(context)]
+    if after != -1:
+        argv += ["-A", str(after)]
+    argv += ["-e", query]
+    argv += (sorted(glob.glob("debug.log*")) or ["debug.log"]) if all else ["debug.log"]
+
+    out = subprocess.run(argv, capture_output=True).stdout
     if tail_limit != -1:
-        cmd += f"| tail -n {tail_limit}"
-
-    return subprocess.run(cmd, shell=True, capture_output=True).stdout
+        out = b"".join(out.splitlines(keepends=True)[-tail_limit:]) if tail_limit else b""
+    return out
 
 
 @cli.cmd